@@ -0,0 +1,144 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from asset_cache import load_assets
+from cache_write import temp_path, commit
+from quality import qc_column, good_values, without_duplicates
+
+# 원천별 변수: 파일 이름 -> 캐시 컬럼
+ARCHIVE_VARIABLES = {
+    'ASOS': {'icsr': '일사(MJ/m2)', 'ta': '온도', 'ws': '풍속'},
+    'today': {'srad': '예측광량', 'temp': '예측온도', 'wspd': '예측풍속'},
+    'tomorrow': {'srad': '예측광량', 'temp': '예측온도', 'wspd': '예측풍속'},
+}
+
+HOUR = np.timedelta64(1, 'h')
+
+
+def source_dir(cache_dir, source, code):
+    if source == 'ASOS':
+        return os.path.join(cache_dir, 'ASOS', str(code))
+    return os.path.join(cache_dir, 'maru', source, str(code))
+
+
+def cache_timestamps(df, source):
+    if source == 'ASOS':
+        return pd.to_datetime(df['tm'], format='%Y-%m-%d %H:%M')
+    return pd.to_datetime(df['fcstDate'].astype(str).str[:10], format='%Y-%m-%d') + \
+        pd.to_timedelta(df['fcstTime'].astype(str) + ':00')
+
+
+def build_archive(source, codes, start_date, end_date, cache_dir='output/cache', archive_dir='output/archive'):
+    # [지점, 시간] 고정 배열을 변수별 .npy 파일로 저장 (float32, 결측은 NaN)
+    codes = [str(code) for code in codes]
+    start = np.datetime64(pd.Timestamp(start_date).floor('D'), 'h')
+    end = np.datetime64(pd.Timestamp(end_date).floor('D') + pd.Timedelta(days=1), 'h')
+    n_hours = int((end - start) / HOUR)
+
+    out_dir = os.path.join(archive_dir, source)
+    os.makedirs(out_dir, exist_ok=True)
+
+    variables = ARCHIVE_VARIABLES[source]
+    columns = set(variables.values()) | {qc_column(col) for col in variables.values()} | {'tm', 'fcstDate', 'fcstTime'}
+    tmp_paths = {name: temp_path(os.path.join(out_dir, f'{name}.npy')) for name in variables}
+    arrays = {}
+    for name in variables:
+        arrays[name] = np.lib.format.open_memmap(tmp_paths[name], mode='w+', dtype=np.float32,
+                                                 shape=(len(codes), n_hours))
+        arrays[name][:] = np.nan
+
+    periods = pd.period_range(start_date, end_date, freq='M')
+    for row, code in enumerate(tqdm(codes, desc=f"Archiving {source}")):
+        base_dir = source_dir(cache_dir, source, code)
+        for period in periods:
+            filename = os.path.join(base_dir, str(period.year), f"{period.month:02d}.csv")
+            if not os.path.exists(filename):
+                continue
+
+            # 중복 행은 제외하고, 품질 플래그가 있는 값은 NaN으로 저장
+            df = without_duplicates(pd.read_csv(filename, usecols=lambda c: c in columns))
+            idx = ((cache_timestamps(df, source).values.astype('datetime64[h]') - start) / HOUR).astype(np.int64)
+            in_range = (idx >= 0) & (idx < n_hours)
+            for name, col in variables.items():
+                values = good_values(df, col).to_numpy(dtype=np.float32)
+                arrays[name][row, idx[in_range]] = values[in_range]
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    for name in variables:
+        commit(tmp_paths[name], os.path.join(out_dir, f'{name}.npy'))
+
+    # 배열을 모두 교체한 뒤 마지막에 meta.json 교체 (중간에 종료되면 Archive가 크기 불일치로 알림)
+    meta = {'source': source, 'codes': codes, 'start': str(start), 'n_hours': n_hours,
+            'variables': variables}
+    meta_path = os.path.join(out_dir, 'meta.json')
+    tmp = temp_path(meta_path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    commit(tmp, meta_path)
+    return out_dir
+
+
+class Archive:
+    def __init__(self, archive_dir, source):
+        path = os.path.join(archive_dir, source)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.source = source
+        self.codes = meta['codes']
+        self.rows = {code: row for row, code in enumerate(self.codes)}
+        self.start = np.datetime64(meta['start'], 'h')
+        self.n_hours = meta['n_hours']
+        self.variables = meta['variables']
+        # 파일 전체를 읽지 않고 필요한 페이지만 접근
+        self.arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in self.variables}
+        for name, array in self.arrays.items():
+            if array.shape != (len(self.codes), self.n_hours):
+                raise ValueError(f"{source}/{name}.npy does not match meta.json, rebuild the archive")
+
+    def hour_index(self, date):
+        return int((np.datetime64(pd.Timestamp(date), 'h') - self.start) / HOUR)
+
+    def window(self, start_date=None, end_date=None):
+        lo = max(self.hour_index(start_date), 0) if start_date is not None else 0
+        hi = min(self.hour_index(end_date) + 1, self.n_hours) if end_date is not None else self.n_hours
+        return lo, max(lo, hi)
+
+    def slice(self, code, start_date=None, end_date=None):
+        # 지점 한 행의 연속 구간이므로 복사 없이 memmap view 반환
+        row = self.rows[str(code)]
+        lo, hi = self.window(start_date, end_date)
+        times = self.start + np.arange(lo, hi) * HOUR
+        return times, {name: array[row, lo:hi] for name, array in self.arrays.items()}
+
+    def slice_all(self, start_date=None, end_date=None):
+        lo, hi = self.window(start_date, end_date)
+        times = self.start + np.arange(lo, hi) * HOUR
+        return times, {name: array[:, lo:hi] for name, array in self.arrays.items()}
+
+    def to_frame(self, code, start_date=None, end_date=None):
+        times, values = self.slice(code, start_date, end_date)
+        df = pd.DataFrame({'tm': times})
+        for name, col in self.variables.items():
+            df[col] = values[name]
+        return df.dropna(subset=list(self.variables.values()), how='all').reset_index(drop=True)
+
+
+def main():
+    start_date = '2019-01-01'  # 시작 날짜
+    end_date = '2024-07-17'  # 종료 날짜
+
+    assets = load_assets()
+    reg_cds = assets['regions']['번호'].unique()
+
+    build_archive('ASOS', assets['stations']['지점코드'].unique(), start_date, end_date)
+    build_archive('today', reg_cds, start_date, end_date)
+    build_archive('tomorrow', reg_cds, start_date, end_date)
+
+
+if __name__ == "__main__":
+    main()
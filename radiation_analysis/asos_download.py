@@ -1,11 +1,20 @@
 import requests
 import pandas as pd
+from quality import validate_asos, write_partition_quality
+import http_cache
+import aggregate_cube
+from cache_write import partition_lock, update_csv, append_rows, write_parquet
 import os
 import ssl
 from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 from tqdm import tqdm
 
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
 
 class SSLAdapter(HTTPAdapter):
     def init_poolmanager(self, *args, **kwargs):
@@ -15,33 +24,55 @@ class SSLAdapter(HTTPAdapter):
         return super().init_poolmanager(*args, **kwargs)
 
 
-def fetch_weather_data(start_date, end_date, stn_ids):
+# 공공데이터포털 ASOS 시간자료 조회 API의 페이지당 최대 행 수
+MAX_NUM_OF_ROWS = 999
+
+# 원본 응답 전체(모든 관측 요소)를 보관하는 위치 (지점/연/월별 parquet)
+RAW_CACHE_DIR = 'output/cache/ASOS_raw'
+
+# 분석에 사용하는 API 필드 -> 컬럼명. 변수를 추가하면 reproject()로 원본에서 다시 만들 수 있음
+ASOS_COLUMNS = {'stnNm': '지점', 'icsr': '일사(MJ/m2)', 'ta': '온도', 'ws': '풍속'}
+
+# 원본 parquet에 숫자(float)로 저장하는 관측 필드. 나머지(코드, 품질 플래그, 새로 생긴 필드)는 모두 문자열
+# 배치마다 값을 보고 형식을 정하면 같은 달의 파일끼리 형식이 달라질 수 있으므로 필드별로 고정
+NUMERIC_FIELDS = ['ta', 'rn', 'ws', 'wd', 'hm', 'pv', 'td', 'pa', 'ps', 'ss', 'icsr', 'dsnw', 'hr3Fhsc',
+                  'dc10Tca', 'dc10LmcsCa', 'lcsCh', 'vs', 'ts', 'm005Te', 'm01Te', 'm02Te', 'm03Te']
+
+
+def create_session():
+    session = requests.Session()
+    session.mount('https://', SSLAdapter())
+    return session
+
+
+def fetch_weather_data(start_date, end_date, stn_ids, start_hh='01', end_hh='01', num_of_rows=MAX_NUM_OF_ROWS,
+                       session=None):
     startDt = start_date.replace('-', '')
     endDt = end_date.replace('-', '')
 
     url = "https://apis.data.go.kr/1360000/AsosHourlyInfoService/getWthrDataList"
     params = {
         'serviceKey': '',
-        'numOfRows': '720',
+        'numOfRows': str(num_of_rows),
         'pageNo': 1,
         'dataType': 'JSON',
         'dataCd': 'ASOS',
         'dateCd': 'HR',
         'startDt': startDt,
-        'startHh': '01',
+        'startHh': start_hh,
         'endDt': endDt,
-        'endHh': '01',
+        'endHh': end_hh,
         'stnIds': stn_ids
     }
 
-    session = requests.Session()
-    session.mount('https://', SSLAdapter())
+    if session is None:
+        session = create_session()
 
     all_data = []
     total_pages = 1
 
     while params['pageNo'] <= total_pages:
-        response = session.get(url, params=params)
+        response = http_cache.cached_get(url, params, http_cache.asos_body_valid, session)
 
         if response.status_code == 200:
             data = response.json()
@@ -70,7 +101,41 @@ def fetch_weather_data(start_date, end_date, stn_ids):
         return None
 
 
+def plan_requests(start_date, end_date, rows_per_request=MAX_NUM_OF_ROWS):
+    # 달력 월 단위 대신 한 번의 호출(한 페이지)이 담을 수 있는 최대 시간 구간으로 분할
+    start = pd.Timestamp(start_date).floor('D')
+    end = pd.Timestamp(end_date).floor('D') + pd.Timedelta(hours=23)
+
+    windows = []
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + pd.Timedelta(hours=rows_per_request - 1), end)
+        windows.append((window_start, window_end))
+        window_start = window_end + pd.Timedelta(hours=1)
+    return windows
+
+
+def fetch_weather_window(window_start, window_end, stn_ids, session=None):
+    return fetch_weather_data(window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'), stn_ids,
+                              start_hh=window_start.strftime('%H'), end_hh=window_end.strftime('%H'),
+                              session=session)
+
+
+def fetch_weather_range(start_date, end_date, stn_ids, rows_per_request=MAX_NUM_OF_ROWS):
+    session = create_session()
+    all_data = []
+    for window_start, window_end in plan_requests(start_date, end_date, rows_per_request):
+        df = fetch_weather_window(window_start, window_end, stn_ids, session)
+        if df is not None:
+            all_data.append(df)
+
+    if all_data:
+        return pd.concat(all_data, ignore_index=True)
+    return None
+
+
 def save_data(df, region_code, cache_dir):
+    cube_dir = aggregate_cube.sibling_cube_dir(cache_dir)
     df['year'] = pd.to_datetime(df['tm']).dt.year.astype(str)
     df['month'] = pd.to_datetime(df['tm']).dt.month.astype(str).str.zfill(2)
 
@@ -78,7 +143,15 @@ def save_data(df, region_code, cache_dir):
         year_month_dir = os.path.join(cache_dir, str(region_code), year)
         os.makedirs(year_month_dir, exist_ok=True)
         filename = os.path.join(year_month_dir, f"{month}.csv")
-        group.to_csv(filename, index=False, encoding='utf-8-sig')
+
+        # 저장된 달 전체로 빠진 시각 요약과 일별/월별 집계도 함께 갱신
+        def on_commit(merged):
+            write_partition_quality(filename, merged)
+            aggregate_cube.update_month('asos', region_code, merged, cube_dir)
+
+        # 같은 달을 여러 프로세스가 나누어 받아도 행이 사라지지 않도록 잠금 후 병합
+        update_csv(filename, group, lambda existing, new: append_rows(existing, new, ['tm'], 'tm'),
+                   on_commit=on_commit, dtype={'year': str, 'month': str})
         # print(f"Saved cache: {filename}")
 
 
@@ -94,14 +167,91 @@ def cache_to_final(region_code, cache_dir, output_dir):
         all_data.append(df)
 
 
-def process_asos_data(asos):
-    asos = asos.copy()
+def process_asos_data(asos, fields=()):
+    # fields: 분석용 컬럼 외에 원본 필드명 그대로 함께 남길 필드 (원본에 없으면 빈 값)
+    asos = asos.reindex(columns=asos.columns.union(list(fields), sort=False))
     asos['일시'] = pd.to_datetime(asos['tm'], format='%Y-%m-%d %H:%M')
     asos['날짜'] = asos['일시'].dt.date
     asos['시간'] = asos['일시'].dt.strftime('%H:%M')
-    asos['icsr'] = asos['icsr'].replace('', 0)
-    asos = asos[['stnNm', '날짜', '시간', 'icsr', 'ta', 'ws', 'tm']]
-    asos.rename(columns={'icsr': '일사(MJ/m2)', 'stnNm': '지점', 'ta': '온도', 'ws': '풍속'}, inplace=True)
+    stn_ids = asos['stnId'].astype(str).unique() if 'stnId' in asos.columns else []
+    asos = asos[['stnNm', '날짜', '시간'] + [col for col in ASOS_COLUMNS if col != 'stnNm'] + list(fields) + ['tm']]
+    asos = asos.rename(columns=ASOS_COLUMNS)
+    # 빈 값은 0이 아닌 결측으로 두고, 변수별 품질 플래그(<컬럼>_qc)를 함께 저장
+    return validate_asos(asos, stn_ids[0] if len(stn_ids) == 1 else None)
+
+
+def type_raw(raw):
+    # 필드별 고정 형식 (API는 모든 값을 문자열로 주고, 빈 값은 결측)
+    raw = raw.copy()
+    for col in raw.columns:
+        if col in NUMERIC_FIELDS:
+            raw[col] = pd.to_numeric(raw[col].replace('', None), errors='coerce').astype(float)
+        elif pd.api.types.is_float_dtype(raw[col]):
+            # 이전 방식으로 숫자로 저장된 문자열 필드 ('12.0' -> '12')
+            raw[col] = raw[col].map(lambda v: None if pd.isna(v) else f'{v:g}').astype('string')
+        else:
+            raw[col] = raw[col].where(raw[col].isna(), raw[col].astype(str)).astype('string')
+    return raw
+
+
+def save_raw(raw, stn_id, raw_dir=RAW_CACHE_DIR):
+    raw = type_raw(raw)
+    months = pd.to_datetime(raw['tm']).dt.strftime('%Y/%m')
+    for month, group in raw.groupby(months):
+        year, mm = month.split('/')
+        year_dir = os.path.join(raw_dir, str(stn_id), year)
+        os.makedirs(year_dir, exist_ok=True)
+        filename = os.path.join(year_dir, f"{mm}.parquet")
+
+        with partition_lock(filename):
+            if os.path.exists(filename):
+                # 기존 파일도 같은 형식으로 맞춘 뒤 합침
+                group = pd.concat([type_raw(pd.read_parquet(filename)), group], ignore_index=True)
+            group = group.drop_duplicates(subset=['tm'], keep='last').sort_values('tm')
+            write_parquet(group, filename)
+
+
+def read_raw(stn_id, start_date, end_date, columns=None, raw_dir=RAW_CACHE_DIR):
+    # 필요한 필드만 읽음 (parquet 열 단위 읽기, 파일에 없는 필드는 제외)
+    frames = []
+    for period in pd.period_range(start_date, end_date, freq='M'):
+        filename = os.path.join(raw_dir, str(stn_id), str(period.year), f"{period.month:02d}.parquet")
+        if os.path.exists(filename):
+            if columns is None or pq is None:
+                df = pd.read_parquet(filename)
+                frames.append(df if columns is None else df[[col for col in columns if col in df.columns]])
+            else:
+                available = pq.read_schema(filename).names
+                frames.append(pd.read_parquet(filename, columns=[col for col in columns if col in available]))
+    if not frames:
+        return None
+
+    raw = pd.concat(frames, ignore_index=True)
+    end = pd.Timestamp(end_date).strftime('%Y-%m-%d') + ' 23:59'
+    return raw[(raw['tm'] >= pd.Timestamp(start_date).strftime('%Y-%m-%d')) & (raw['tm'] <= end)]
+
+
+def load_asos(stn_id, start_date, end_date, raw_dir=RAW_CACHE_DIR, fields=()):
+    # 현재 ASOS_COLUMNS 기준으로 원본에서 바로 투영 (fields로 원본 필드를 더 가져올 수 있음)
+    raw = read_raw(stn_id, start_date, end_date, ['tm', 'stnId'] + list(ASOS_COLUMNS) + list(fields), raw_dir)
+    if raw is None or raw.empty:
+        return None
+    return process_asos_data(raw, fields)
+
+
+def ingest(raw, stn_id, cache_dir, raw_dir=RAW_CACHE_DIR):
+    # 원본 전체를 보관한 뒤 분석용 컬럼만 CSV 캐시에 저장
+    save_raw(raw, stn_id, raw_dir)
+    asos = process_asos_data(raw)
+    save_data(asos, stn_id, cache_dir)
+    return asos
+
+
+def reproject(stn_id, start_date, end_date, cache_dir, raw_dir=RAW_CACHE_DIR):
+    # API 재요청 없이 원본에서 CSV 캐시를 다시 만듦
+    asos = load_asos(stn_id, start_date, end_date, raw_dir)
+    if asos is not None:
+        save_data(asos, stn_id, cache_dir)
     return asos
 
 
@@ -115,24 +265,11 @@ def main():
     os.makedirs(cache_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-
-    current_date = start_date_obj
-
-    while current_date <= end_date_obj:
-        next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-        fetch_end_date = min(end_date_obj, next_month - timedelta(days=1))
-
-        asos_df = fetch_weather_data(current_date.strftime('%Y-%m-%d'), fetch_end_date.strftime('%Y-%m-%d'), stn_ids)
-        if asos_df is not None:
-            asos_df = process_asos_data(asos_df)
-            save_data(asos_df, stn_ids, cache_dir)
-        else:
-            print(
-                f"No data fetched for period: {current_date.strftime('%Y-%m-%d')} to {fetch_end_date.strftime('%Y-%m-%d')}")
-
-        current_date = next_month
+    asos_df = fetch_weather_range(start_date, end_date, stn_ids)
+    if asos_df is not None:
+        ingest(asos_df, stn_ids, cache_dir)
+    else:
+        print(f"No data fetched for period: {start_date} to {end_date}")
 
     cache_to_final(stn_ids, cache_dir, output_dir)
 
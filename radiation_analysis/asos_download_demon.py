@@ -4,16 +4,10 @@ import time
 import random
 from datetime import datetime, timedelta
 import asos_download
+from station_mapping import load_mapping, nearest_station_pairs
 from tqdm import tqdm
 import json
 
-def preprocess_sitation(stn, reg):
-    reg['sido'] = reg['지역명'].str.split(' ').str[0]
-    reg['sig'] = reg['지역명'].str.split(' ').str[1].str[:-1]
-
-    station = pd.merge(stn, reg, left_on='지점명', right_on='sig')
-    return station
-
 def file_exists(output_dir, reg_cd, year, month):
     year_dir = os.path.join(output_dir, str(reg_cd), year)
     file_name = os.path.join(year_dir, f"{month}.csv")
@@ -23,11 +17,10 @@ def file_exists(output_dir, reg_cd, year, month):
         print(f"Directory listing for {year_dir}: {os.listdir(year_dir) if os.path.exists(year_dir) else 'Directory does not exist'}")
     return file_exists
 
-def fetch_data_with_retry(start_date, end_date, stn_id, max_retries=3):
+def fetch_data_with_retry(start_date, end_date, stn_id, max_retries=3, session=None):
     for attempt in range(max_retries):
         try:
-            asos_df = asos_download.fetch_weather_data(start_date.strftime('%Y-%m-%d'),
-                                                       end_date.strftime('%Y-%m-%d'), stn_id)
+            asos_df = asos_download.fetch_weather_window(start_date, end_date, stn_id, session)
             return asos_df
         except json.JSONDecodeError as e:
             print(f"JSON decode error on attempt {attempt + 1}/{max_retries}: {e}")
@@ -39,14 +32,31 @@ def fetch_data_with_retry(start_date, end_date, stn_id, max_retries=3):
                 print("Max retries reached. Skipping this period.")
                 return None
 
-def main():
-    stn = pd.read_excel('../assets/지점코드.xlsx')
-    reg = pd.read_csv('../assets/태양광 발전 예측_지역번호.csv')
+def missing_spans(output_dir, stn_id, start_date_obj, end_date_obj):
+    # 캐시에 없는 월들을 연속 구간으로 묶어서 반환
+    spans = []
+    current_date = start_date_obj
+    while current_date <= end_date_obj:
+        year_month = current_date.strftime('%Y-%m')
+        next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+        fetch_end_date = min(end_date_obj, next_month - timedelta(days=1))
+
+        if file_exists(output_dir, stn_id, year_month[:4], year_month[5:7]):
+            print(f"Skipping ASOS data for station {stn_id} for {year_month}")
+        elif spans and spans[-1][1] + timedelta(days=1) == current_date:
+            spans[-1] = (spans[-1][0], fetch_end_date)
+        else:
+            spans.append((current_date, fetch_end_date))
+
+        current_date = next_month
+    return spans
 
+def main():
     start_date = '2019-01-01'  # 시작 날짜
     end_date = '2024-07-17'  # 종료 날짜
 
-    station = preprocess_sitation(stn, reg)
+    # 지역별 최근접 측후소 (보고서와 병합 뷰가 쓰는 짝)
+    stn_ids = nearest_station_pairs(load_mapping())['지점코드'].unique()
 
     output_dir = 'output'
     asos_cache_dir = os.path.join(output_dir, 'cache', 'ASOS')
@@ -57,34 +67,32 @@ def main():
     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
     today = datetime.today().strftime('%Y-%m')
 
-    for stn_id in tqdm(station['지점코드'].unique(), desc="ASOS Data Download"):
-        current_date = start_date_obj
-        while current_date <= end_date_obj:
-            year_month = current_date.strftime('%Y-%m')
-            next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            fetch_end_date = min(end_date_obj, next_month - timedelta(days=1))
-
-            # Skip already downloaded data
-            if file_exists(asos_cache_dir, stn_id, year_month[:4], year_month[5:7]):
-                print(f"Skipping ASOS data for station {stn_id} for {year_month}")
-                current_date = next_month
-                continue
-
-            # Fetch ASOS data with retry logic
-            asos_df = fetch_data_with_retry(current_date, fetch_end_date, stn_id)
-            if asos_df is not None:
-                asos_df = asos_download.process_asos_data(asos_df)
-                asos_download.save_data(asos_df, stn_id, asos_cache_dir)
-            else:
-                print(f"No data fetched for period: {current_date.strftime('%Y-%m-%d')} to {fetch_end_date.strftime('%Y-%m-%d')} for station {stn_id}")
+    session = asos_download.create_session()
+    request_count = 0
+    started = time.time()
+
+    for stn_id in tqdm(stn_ids, desc="ASOS Data Download"):
+        for span_start, span_end in missing_spans(asos_cache_dir, stn_id, start_date_obj, end_date_obj):
+            # 한 번의 호출에 최대 행 수(999시간)를 채우는 구간 단위로 요청
+            frames = []
+            for window_start, window_end in asos_download.plan_requests(span_start, span_end):
+                asos_df = fetch_data_with_retry(window_start, window_end, stn_id, session=session)
+                request_count += 1
+                if asos_df is not None:
+                    frames.append(asos_df)
+                else:
+                    print(f"No data fetched for period: {window_start} to {window_end} for station {stn_id}")
+
+                # Sleep to prevent API overload
+                time.sleep(random.uniform(1, 3))
 
-            # Sleep to prevent API overload
-            time.sleep(random.uniform(5, 15))
+            if frames:
+                asos_download.ingest(pd.concat(frames, ignore_index=True), stn_id, asos_cache_dir)
 
-            current_date = next_month
+    print(f"ASOS requests: {request_count}, elapsed: {time.time() - started:.1f}s")
 
     # Move cache to final output for ASOS data
-    for stn_id in tqdm(station['지점코드'].unique(), desc="ASOS Data Finalizing"):
+    for stn_id in tqdm(stn_ids, desc="ASOS Data Finalizing"):
         asos_download.cache_to_final(stn_id, asos_cache_dir, output_dir)
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import os
+import hashlib
+import pickle
+import pandas as pd
+from cache_write import temp_path, commit
+
+STATION_PATH = '../assets/지점코드.xlsx'
+REGION_PATH = '../assets/태양광 발전 예측_지역번호.csv'
+ASSET_CACHE_PATH = 'output/cache/assets.pkl'
+
+
+def file_checksum(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(path.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def compile_assets(stn_path=STATION_PATH, reg_path=REGION_PATH):
+    stn = pd.read_excel(stn_path)
+    stn['지점코드'] = stn['지점코드'].astype(str)
+
+    reg = pd.read_csv(reg_path)
+    reg['번호'] = reg['번호'].apply(lambda x: str(x).ljust(10, '0'))
+    reg = reg.drop_duplicates('번호').reset_index(drop=True)
+    reg['sido'] = reg['지역명'].str.split(' ').str[0]
+    reg['sig'] = reg['지역명'].str.split(' ').str[1].str[:-1]
+
+    station = pd.merge(stn, reg, left_on='지점명', right_on='sig')
+
+    return {
+        'stations': stn,
+        'regions': reg[['번호', '지역명', 'sido', 'sig']],
+        'station_pairs': station,
+        # 코드 -> 값 사전 (O(1) 조회)
+        'station_by_code': stn.set_index('지점코드').to_dict('index'),
+        'region_names': dict(zip(reg['번호'], reg['지역명'])),
+    }
+
+
+def load_cached(cache_path):
+    # 읽을 수 없거나 잘린 pickle은 캐시에 없는 것으로 처리
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    return cached if isinstance(cached, dict) else None
+
+
+def load_assets(cache_path=ASSET_CACHE_PATH, stn_path=STATION_PATH, reg_path=REGION_PATH):
+    # 원본 자산 파일의 checksum이 바뀐 경우에만 xlsx/csv를 다시 파싱
+    checksum = file_checksum([stn_path, reg_path])
+    cached = load_cached(cache_path)
+    if cached is not None and cached.get('checksum') == checksum:
+        return cached['assets']
+
+    assets = compile_assets(stn_path, reg_path)
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    # 여러 워커가 처음 동시에 호출해도 서로의 임시 파일을 덮어쓰지 않도록 작성자별 임시 파일 사용
+    tmp = temp_path(cache_path)
+    with open(tmp, 'wb') as f:
+        pickle.dump({'checksum': checksum, 'assets': assets}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    commit(tmp, cache_path)
+    return assets
+
+
+def main():
+    assets = load_assets()
+    print(f"Stations: {len(assets['stations'])}, regions: {len(assets['regions'])}, "
+          f"matched pairs: {len(assets['station_pairs'])}")
+
+
+if __name__ == "__main__":
+    main()
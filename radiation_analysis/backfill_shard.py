@@ -0,0 +1,368 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import functools
+import socket
+import sqlite3
+import multiprocessing
+from datetime import datetime, timedelta
+import pandas as pd
+import asos_download
+import solar_panel_radiation_download
+import asset_cache
+from station_mapping import load_mapping, nearest_station_pairs
+from quality import validate_forecast, region_station, write_partition_quality
+from cache_write import update_csv, append_rows
+import aggregate_cube
+
+DB_PATH = 'output/cache/backfill.sqlite'
+ASOS_CACHE_DIR = 'output/cache/ASOS'
+ASOS_RAW_DIR = 'output/cache/ASOS_raw'
+MARU_CACHE_DIR = 'output/cache/maru'
+LEASE_SECONDS = 600
+HEARTBEAT_SECONDS = 60
+GLOBAL_RATE = 1.0  # 전체 워커가 나눠 쓰는 초당 요청 수
+MAX_ATTEMPTS = 3
+IDLE_SECONDS = 5  # 다른 워커가 잡고 있는 작업이 끝나거나 만료되기를 기다리는 간격
+
+
+class LeaseLost(Exception):
+    # 임대 기간 안에 갱신하지 못해 다른 워커가 작업을 가져감
+    pass
+
+
+def connect(db_path=DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        code TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS workers (
+        worker_id TEXT PRIMARY KEY,
+        heartbeat REAL NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS config (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL)''')
+    return conn
+
+
+def month_ranges(start_date, end_date):
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    for period in pd.period_range(start, end, freq='M'):
+        month_start = max(period.start_time.normalize(), start)
+        month_end = min(period.end_time.normalize(), end)
+        yield month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d')
+
+
+def add_jobs(conn, rows, global_rate=GLOBAL_RATE):
+    conn.execute('BEGIN IMMEDIATE')
+    conn.executemany('INSERT OR IGNORE INTO jobs (job_id, kind, code, start_date, end_date) VALUES (?, ?, ?, ?, ?)',
+                     rows)
+    conn.execute('INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)', ('global_rate', str(global_rate)))
+    conn.execute('COMMIT')
+
+
+def plan_jobs(conn, start_date, end_date, global_rate=GLOBAL_RATE):
+    # 코디네이터: 지점×월, 지역×월 단위 작업을 등록 (한 작업이 한 캐시 파일만 기록)
+    # ASOS는 지역별 최근접 측후소(보고서, 병합 뷰, 예보 품질 검사가 쓰는 짝)를 받음
+    assets = asset_cache.load_assets()
+    rows = []
+    for stn_id in nearest_station_pairs(load_mapping())['지점코드'].unique():
+        for month_start, month_end in month_ranges(start_date, end_date):
+            rows.append((f'asos:{stn_id}:{month_start}', 'asos', str(stn_id), month_start, month_end))
+    for reg_cd in assets['regions']['번호'].unique():
+        for month_start, month_end in month_ranges(start_date, end_date):
+            rows.append((f'maru:{reg_cd}:{month_start}', 'maru', reg_cd, month_start, month_end))
+    add_jobs(conn, rows, global_rate)
+    print(f"Planned {len(rows)} jobs")
+
+
+def heartbeat(conn, worker_id):
+    conn.execute('INSERT OR REPLACE INTO workers (worker_id, heartbeat) VALUES (?, ?)', (worker_id, time.time()))
+
+
+def rate_slice(conn):
+    # 살아있는 워커 수로 전체 요청 한도를 나눔
+    global_rate = conn.execute("SELECT value FROM config WHERE key = 'global_rate'").fetchone()
+    global_rate = float(global_rate[0]) if global_rate else GLOBAL_RATE
+    active = conn.execute('SELECT COUNT(*) FROM workers WHERE heartbeat > ?',
+                          (time.time() - 2 * HEARTBEAT_SECONDS,)).fetchone()[0]
+    return global_rate / max(active, 1)
+
+
+def claim_job(conn, worker_id, lease_seconds=LEASE_SECONDS):
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    # 시도 횟수를 모두 쓴 뒤 임대가 만료된 작업(워커가 도중에 종료됨)은 실패로 정리
+    conn.execute('''UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL,
+                    error = COALESCE(error, 'lease expired')
+                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?''', (now, MAX_ATTEMPTS))
+    row = conn.execute('''SELECT job_id, kind, code, start_date, end_date, attempts FROM jobs
+                          WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                          AND attempts < ?
+                          ORDER BY job_id LIMIT 1''', (now, MAX_ATTEMPTS)).fetchone()
+    if row is None:
+        conn.execute('COMMIT')
+        return None
+    conn.execute('''UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE job_id = ?''', (worker_id, now + lease_seconds, row[0]))
+    conn.execute('COMMIT')
+    job = dict(zip(['job_id', 'kind', 'code', 'start_date', 'end_date', 'attempts'], row))
+    job['attempts'] += 1
+    return job
+
+
+def renew_lease(conn, worker_id, job_id, lease_seconds=LEASE_SECONDS):
+    cursor = conn.execute('''UPDATE jobs SET lease_expires = ?
+                             WHERE status = 'leased' AND job_id = ? AND lease_owner = ?''',
+                          (time.time() + lease_seconds, job_id, worker_id))
+    if cursor.rowcount == 0:
+        raise LeaseLost(job_id)
+
+
+def leased_elsewhere(conn):
+    # 아직 끝나지 않은(다른 워커가 잡고 있거나 만료를 기다리는) 작업 수
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased'").fetchone()[0]
+
+
+def finish_job(conn, worker_id, job_id, error=None):
+    if error is None:
+        cursor = conn.execute('''UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, error = NULL
+                                 WHERE job_id = ? AND lease_owner = ?''', (job_id, worker_id))
+    else:
+        cursor = conn.execute('''UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                 lease_owner = NULL, lease_expires = NULL, error = ?
+                                 WHERE job_id = ? AND lease_owner = ?''', (MAX_ATTEMPTS, error, job_id, worker_id))
+    if cursor.rowcount == 0:
+        print(f"[{worker_id}] Lease on {job_id} was lost before it finished")
+    return cursor.rowcount == 1
+
+
+class Throttle:
+    def __init__(self, conn, worker_id, lease_seconds=LEASE_SECONDS):
+        self.conn = conn
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.job_id = None  # 현재 작업 (요청 사이에 임대 기간을 연장)
+        self.last_request = 0.0
+        self.rate = rate_slice(conn)
+        self.rate_checked = time.time()
+
+    def start(self, job_id):
+        self.job_id = job_id
+        self.rate_checked = time.time()
+
+    def wait(self):
+        # 주기적으로 heartbeat와 현재 작업의 임대 연장을 남기고 워커 수에 맞춰 요청 간격을 다시 계산
+        if time.time() - self.rate_checked > min(HEARTBEAT_SECONDS, self.lease_seconds / 3):
+            heartbeat(self.conn, self.worker_id)
+            if self.job_id is not None:
+                renew_lease(self.conn, self.worker_id, self.job_id, self.lease_seconds)
+            self.rate = rate_slice(self.conn)
+            self.rate_checked = time.time()
+        delay = self.last_request + 1.0 / self.rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_request = time.time()
+
+
+def run_asos_job(job, throttle, session):
+    frames = []
+    for window_start, window_end in asos_download.plan_requests(job['start_date'], job['end_date']):
+        throttle.wait()
+        df = asos_download.fetch_weather_window(window_start, window_end, job['code'], session)
+        if df is not None:
+            frames.append(df)
+    if frames:
+        asos_download.ingest(pd.concat(frames, ignore_index=True), job['code'], ASOS_CACHE_DIR, ASOS_RAW_DIR)
+
+
+def merge_maru_month(existing, df, stn_id=None):
+    df = append_rows(existing, df, ['fcstDate', 'fcstTime'], ['fcstDate', 'fcstTime'])
+    return validate_forecast(df, stn_id)
+
+
+def save_maru_month(df, prefix, reg_cd):
+    # 작업이 재할당되어 다시 실행되어도 같은 행이 중복되지 않도록 병합 후 저장
+    # 월말 발표분의 내일 예측은 다음 달이므로 예측 날짜의 달별로 나누어 저장
+    stn_id = region_station(reg_cd)
+    cube_dir = aggregate_cube.sibling_cube_dir(MARU_CACHE_DIR)
+    for (year, month), group in df.groupby([df['fcstDate'].dt.year, df['fcstDate'].dt.month]):
+        year_dir = os.path.join(MARU_CACHE_DIR, prefix, reg_cd, str(year))
+        os.makedirs(year_dir, exist_ok=True)
+        file_name = os.path.join(year_dir, f"{month:02d}.csv")
+
+        def on_commit(merged):
+            write_partition_quality(file_name, merged)
+            aggregate_cube.update_month(prefix, reg_cd, merged, cube_dir)
+
+        update_csv(file_name, group, lambda existing, new: merge_maru_month(existing, new, stn_id),
+                   on_commit=on_commit, parse_dates=['fcstDate'], dtype={'year': str, 'month': str})
+
+
+def run_maru_job(job, throttle, region_names):
+    site = region_names[job['code']]
+    today_frames, tomorrow_frames = [], []
+    for date in pd.date_range(job['start_date'], job['end_date']).strftime('%Y%m%d'):
+        throttle.wait()
+        today_df, tomorrow_df = solar_panel_radiation_download.process_weather_data(date, job['code'], site)
+        today_frames.append(today_df)
+        tomorrow_frames.append(tomorrow_df)
+
+    for prefix, frames in (('today', today_frames), ('tomorrow', tomorrow_frames)):
+        frames = [df for df in frames if not df.empty]
+        if frames:
+            save_maru_month(pd.concat(frames, ignore_index=True), prefix, job['code'])
+
+
+def backfill_runner():
+    session = asos_download.create_session()
+    region_names = asset_cache.load_assets()['region_names']
+
+    def run_job(job, throttle):
+        if job['kind'] == 'asos':
+            run_asos_job(job, throttle, session)
+        else:
+            run_maru_job(job, throttle, region_names)
+    return run_job
+
+
+def run_worker(db_path=DB_PATH, worker_id=None, run_job=None, lease_seconds=LEASE_SECONDS):
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = connect(db_path)
+    heartbeat(conn, worker_id)
+    throttle = Throttle(conn, worker_id, lease_seconds)
+    run_job = run_job or backfill_runner()
+    done = 0
+
+    while True:
+        job = claim_job(conn, worker_id, lease_seconds)
+        if job is None:
+            # 다른 워커의 작업이 남아 있으면 끝나거나 임대가 만료될 때까지 대기 (종료된 워커의 작업을 이어받음)
+            if leased_elsewhere(conn):
+                heartbeat(conn, worker_id)
+                time.sleep(min(IDLE_SECONDS, lease_seconds / 3))
+                continue
+            break
+
+        throttle.start(job['job_id'])
+        try:
+            run_job(job, throttle)
+            if finish_job(conn, worker_id, job['job_id']):
+                done += 1
+        except LeaseLost:
+            # 다른 워커가 다시 실행하므로 결과를 기록하지 않음 (캐시 저장은 키 기준 병합이라 중복되지 않음)
+            print(f"[{worker_id}] Lease on {job['job_id']} expired, leaving it to its new owner")
+        except Exception as e:
+            print(f"[{worker_id}] Error in {job['job_id']}: {e}")
+            finish_job(conn, worker_id, job['job_id'], error=str(e))
+        throttle.start(None)
+
+    conn.execute('DELETE FROM workers WHERE worker_id = ?', (worker_id,))
+    conn.close()
+    print(f"[{worker_id}] finished {done} jobs")
+    return done
+
+
+def progress(db_path=DB_PATH):
+    conn = connect(db_path)
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+    conn.close()
+    return counts
+
+
+def run_local(n_workers, db_path=DB_PATH, run_job=None, lease_seconds=LEASE_SECONDS):
+    # 한 대에서 여러 프로세스로 워커를 실행 (여러 호스트는 같은 db_path를 공유하여 run_worker 실행)
+    processes = [multiprocessing.Process(target=run_worker, args=(db_path, f"local-{i}", run_job, lease_seconds))
+                 for i in range(n_workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(progress(db_path))
+
+
+def stub_job(log_path, job, throttle):
+    # 시험용 작업: API 대신 임대 기간보다 오래 걸리는 요청을 흉내 내고, 완료한 작업을 기록
+    if job['code'] == 'fail':
+        raise RuntimeError('stub failure')
+    if job['code'] == 'crash' and job['attempts'] == 1:
+        os._exit(1)  # 첫 시도에서 워커가 비정상 종료
+    for _ in range(int(job['end_date'])):
+        throttle.wait()
+        time.sleep(0.05)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(f"{job['job_id']}\n")
+
+
+def local_test(n_workers=4, n_jobs=24, lease_seconds=2.0):
+    # 여러 프로세스가 같은 작업 저장소를 나눠 쓸 때 모든 작업이 정확히 한 번 끝나는지 확인
+    # (작업 시간이 임대 기간보다 길어 임대 연장이 필요하고, 종료된 워커의 작업과 계속 실패하는 작업을 포함)
+    root = tempfile.mkdtemp()
+    db_path = os.path.join(root, 'backfill.sqlite')
+    log_path = os.path.join(root, 'completed.log')
+    try:
+        rows = [(f'stub:{i:03d}', 'stub', 'ok', '', str(60 if i % 4 == 0 else 5)) for i in range(n_jobs)]
+        rows += [('stub:crash', 'stub', 'crash', '', '5'), ('stub:fail', 'stub', 'fail', '', '5')]
+        conn = connect(db_path)
+        add_jobs(conn, rows, global_rate=1000.0)
+        conn.close()
+
+        run_local(n_workers, db_path, functools.partial(stub_job, log_path), lease_seconds)
+
+        with open(log_path, encoding='utf-8') as f:
+            completed = pd.Series(f.read().split()).value_counts()
+        conn = connect(db_path)
+        status = dict(conn.execute('SELECT job_id, status FROM jobs').fetchall())
+        conn.close()
+
+        expected = [row[0] for row in rows if row[0] != 'stub:fail']
+        problems = []
+        if sorted(completed.index) != sorted(expected):
+            problems.append(f'completed {len(completed)} of {len(expected)} jobs')
+        if (completed > 1).any():
+            problems.append(f'ran more than once: {list(completed[completed > 1].index)}')
+        if any(status[job_id] != 'done' for job_id in expected):
+            problems.append('jobs not marked done')
+        if status['stub:fail'] != 'failed':
+            problems.append('failing job not marked failed')
+
+        print(f"{n_workers} workers x {len(rows)} jobs (lease {lease_seconds}s): "
+              f"{'OK' if not problems else '; '.join(problems)}")
+        return not problems
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    start_date = '2019-01-01'  # 시작 날짜
+    end_date = (datetime.today() - timedelta(days=1)).strftime('%Y-%m-%d')  # 종료 날짜
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'local'
+    if mode == 'coordinator':
+        plan_jobs(connect(), start_date, end_date)
+    elif mode == 'worker':
+        run_worker()
+    elif mode == 'status':
+        print(progress())
+    elif mode == 'test':
+        sys.exit(0 if local_test() else 1)
+    else:
+        plan_jobs(connect(), start_date, end_date)
+        run_local(int(sys.argv[2]) if len(sys.argv) > 2 else 4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import os
+import io
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from report import month_files, read_files, pair_inputs, fingerprint, compute_metrics, missing_hour_counts, \
+    load_station_pairs
+from asset_cache import STATION_PATH, REGION_PATH
+from station_mapping import CENTROID_PATH
+from merged_view import merge_sources
+from visualization import filter_by_date_range
+import aggregate_cube
+import asos_download
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CACHE_DIR = 'output/cache'
+HOST = '0.0.0.0'
+PORT = 8000
+LRU_SIZE = 128  # 메모리에 유지하는 응답 수
+
+# 경로를 만드는 데 쓰이는 파라미터는 숫자 코드만 허용 ('../' 등 차단)
+CODE_PARAMS = ['stn', 'reg', 'code']
+CODE_PATTERN = re.compile(r'^\d+$')
+FIELD_PATTERN = re.compile(r'^[A-Za-z0-9]+$')
+
+
+class ResponseCache:
+    # ETag -> (content_type, body) LRU
+    def __init__(self, max_entries=LRU_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, etag):
+        with self.lock:
+            if etag in self.entries:
+                self.entries.move_to_end(etag)
+                return self.entries[etag]
+        return None
+
+    def put(self, etag, value):
+        with self.lock:
+            self.entries[etag] = value
+            self.entries.move_to_end(etag)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def query_range(params):
+    start_date = params.get('from', '2019-01-01')
+    end_date = params.get('to', pd.Timestamp.today().strftime('%Y-%m-%d'))
+    return start_date, end_date
+
+
+def make_etag(endpoint, params, inputs):
+    # 요청 파라미터와 입력 파일 상태(크기, 수정 시각)가 같으면 같은 ETag
+    state = fingerprint(inputs, *query_range(params))
+    key = json.dumps([endpoint, sorted(params.items()), state], sort_keys=True, ensure_ascii=False)
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest() + '"'
+
+
+def validate_params(params):
+    for key in CODE_PARAMS:
+        if key in params and not CODE_PATTERN.match(params[key]):
+            raise ValueError(f'{key} must be a numeric code')
+    fmt = params.get('format', 'json')
+    if fmt not in ('json', 'arrow'):
+        raise ValueError("format must be 'json' or 'arrow'")
+    if fmt == 'arrow' and pa is None:
+        raise ValueError('pyarrow is not installed')
+
+
+def asos_fields(params):
+    # 분석용 컬럼 외에 원본에서 함께 가져올 필드 (예: fields=hm,ss)
+    fields = [field for field in params.get('fields', '').split(',') if field]
+    if not all(FIELD_PATTERN.match(field) for field in fields):
+        raise ValueError('fields must be API field names')
+    return fields
+
+
+def month_key(path):
+    # '.../<YYYY>/<MM>.csv' -> ('YYYY', 'MM')
+    year_dir, filename = os.path.split(path)
+    return os.path.basename(year_dir), os.path.splitext(filename)[0]
+
+
+def asos_inputs(cache_dir, params):
+    # 원본(parquet)이 있는 달은 원본에서 읽고, 없는 달(원본 보관 이전)은 CSV 캐시를 사용
+    start_date, end_date = query_range(params)
+    fields = asos_fields(params)
+    raw = month_files(os.path.join(cache_dir, 'ASOS_raw', params['stn']), start_date, end_date, 'parquet')
+    raw_months = {month_key(path) for path in raw}
+    csv = [path for path in month_files(os.path.join(cache_dir, 'ASOS', params['stn']), start_date, end_date)
+           if month_key(path) not in raw_months]
+    if csv and fields:
+        raise ValueError('fields requires the raw ASOS cache for every month in the range')
+    return {'raw': raw, 'asos': csv}
+
+
+def forecast_inputs(cache_dir, params):
+    lead = params.get('lead', 'today')
+    if lead not in ('today', 'tomorrow'):
+        raise ValueError("lead must be 'today' or 'tomorrow'")
+    return {lead: month_files(os.path.join(cache_dir, 'maru', lead, params['reg']), *query_range(params))}
+
+
+def metrics_inputs(cache_dir, params):
+    return pair_inputs(cache_dir, params['stn'], params['reg'], *query_range(params))
+
+
+def cube_inputs(cache_dir, params):
+    kind, level = params['kind'], params.get('level', 'daily')
+    if kind not in aggregate_cube.KINDS or level not in aggregate_cube.LEVELS:
+        raise ValueError(f"kind must be one of {list(aggregate_cube.KINDS)}, level one of {aggregate_cube.LEVELS}")
+    path = aggregate_cube.cube_path(kind, params['code'], level, os.path.join(cache_dir, 'cube'))
+    return {'cube': [path] if os.path.exists(path) else []}
+
+
+def pairs_inputs(cache_dir, params):
+    # 매핑은 자산 파일(측후소, 지역, 지역 좌표)이 바뀔 때만 달라짐
+    return {'assets': [path for path in (STATION_PATH, REGION_PATH, CENTROID_PATH) if os.path.exists(path)]}
+
+
+def load_asos(cache_dir, inputs, params):
+    start_date, end_date = query_range(params)
+    frames = []
+    if inputs['raw']:
+        # 현재 컬럼 구성으로 읽을 때 투영 (변수를 추가해도 다시 수집하지 않음)
+        raw = asos_download.load_asos(params['stn'], start_date, end_date, os.path.join(cache_dir, 'ASOS_raw'),
+                                      asos_fields(params))
+        if raw is not None:
+            frames.append(raw.astype({'날짜': str}))
+    df = read_files(inputs['asos'])
+    if not df.empty:
+        df = filter_by_date_range(df, start_date, f'{end_date} 23:59')
+        frames.append(df.drop(columns=['timestamp', 'year', 'month'], errors='ignore'))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values('tm').reset_index(drop=True)
+
+
+def load_forecast(cache_dir, inputs, params):
+    start_date, end_date = query_range(params)
+    df = read_files(next(iter(inputs.values())))
+    if df.empty:
+        return df
+    dates = df['fcstDate'].astype(str).str[:10]
+    return df[(dates >= start_date) & (dates <= end_date)].reset_index(drop=True)
+
+
+def load_metrics(cache_dir, inputs, params):
+    # 읽기 전용: 병합 뷰를 갱신하지 않고 ETag 입력인 월 파일들을 메모리에서 병합
+    start_date, end_date = query_range(params)
+    if not inputs['asos'] or not inputs['today'] or not inputs['tomorrow']:
+        return pd.DataFrame()
+
+    asos = read_files(inputs['asos'])
+    merged_today, merged_tomorrow = [filter_by_day(merge_sources(asos, read_files(inputs[lead])), start_date, end_date)
+                                     for lead in ('today', 'tomorrow')]
+    metrics = {'지점코드': params['stn'], '번호': params['reg']}
+    metrics.update(compute_metrics(merged_today, merged_tomorrow))
+    metrics.update(missing_hour_counts(inputs, start_date, end_date))
+    return pd.DataFrame([metrics])
+
+
+def filter_by_day(merged, start_date, end_date):
+    dates = merged['날짜'].dt.strftime('%Y-%m-%d')
+    return merged[(dates >= start_date) & (dates <= end_date)].reset_index(drop=True)
+
+
+def load_pairs(cache_dir, inputs, params):
+    return load_station_pairs(cache_dir)
+
+
+def load_cube(cache_dir, inputs, params):
+    # 수집 시 갱신되는 일별/월별 집계 (시간 자료를 읽지 않음)
+    start_date, end_date = query_range(params)
+    return aggregate_cube.query(params['kind'], params['code'], params.get('level', 'daily'), start_date, end_date,
+                                os.path.join(cache_dir, 'cube'))
+
+
+response_cache = ResponseCache()
+
+# 경로 -> (필수 파라미터, 입력 파일 목록 함수, 데이터 로드 함수)
+ENDPOINTS = {
+    '/asos': (['stn'], asos_inputs, load_asos),
+    '/forecast': (['reg'], forecast_inputs, load_forecast),
+    '/metrics': (['stn', 'reg'], metrics_inputs, load_metrics),
+    '/cube': (['kind', 'code'], cube_inputs, load_cube),
+    '/pairs': ([], pairs_inputs, load_pairs),
+}
+
+
+def encode_frame(df, fmt):
+    if fmt == 'arrow':
+        if pa is None:
+            raise ValueError('pyarrow is not installed')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return 'application/vnd.apache.arrow.stream', sink.getvalue()
+
+    # 열 단위 JSON: {"columns": [...], "data": {컬럼: [값, ...]}}
+    data = df.astype(object).where(df.notna(), None)
+    body = {'columns': list(df.columns), 'rows': len(df), 'data': data.to_dict('list')}
+    return 'application/json; charset=utf-8', json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    cache_dir = CACHE_DIR
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path not in ENDPOINTS:
+            return self.send_error(404, f'Unknown endpoint {url.path}')
+
+        required, inputs_func, load_func = ENDPOINTS[url.path]
+        missing = [key for key in required if key not in params]
+        if missing:
+            return self.send_error(400, f"Missing parameters: {', '.join(missing)}")
+
+        try:
+            validate_params(params)
+            inputs = inputs_func(self.cache_dir, params)
+            etag = make_etag(url.path, params, inputs)
+        except ValueError as e:
+            return self.send_error(400, str(e))
+        if self.headers.get('If-None-Match') == etag:
+            return self.send_body(304, None, b'', etag)
+
+        cached = response_cache.get(etag)
+        if cached is None:
+            try:
+                cached = encode_frame(load_func(self.cache_dir, inputs, params), params.get('format', 'json'))
+            except Exception as e:
+                # 캐시 파일 손상, 컬럼 누락 등은 연결을 끊지 않고 500으로 응답
+                self.log_error('Error in %s: %r', self.path, e)
+                return self.send_error(500, 'Failed to load cached data')
+            response_cache.put(etag, cached)
+
+        self.send_body(200, *cached, etag)
+
+    def send_body(self, code, content_type, body, etag=None):
+        self.send_response(code)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def serve(host=HOST, port=PORT, cache_dir=CACHE_DIR):
+    CacheRequestHandler.cache_dir = cache_dir
+    server = ThreadingHTTPServer((host, port), CacheRequestHandler)
+    print(f"Serving {cache_dir} on http://{host}:{port}")
+    server.serve_forever()
+
+
+def main():
+    serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from tqdm import tqdm
+import aggregate_cube
+from cache_write import partition_lock, update_csv
+from quality import ASOS_KEYS, FORECAST_KEYS, validate_asos, validate_forecast, region_station, \
+    write_partition_quality, qc_path
+
+MAX_WORKERS = 4
+
+
+def find_partitions(cache_dir):
+    # (종류, 코드, 경로) 목록: ASOS/<지점>/<YYYY>/<MM>.csv, maru/<today|tomorrow>/<지역>/<YYYY>/<MM>.csv
+    partitions = []
+    for path in glob.glob(os.path.join(cache_dir, 'ASOS', '*', '[0-9][0-9][0-9][0-9]', '[0-9][0-9].csv')):
+        partitions.append(('asos', path.split(os.sep)[-3], path))
+    for path in glob.glob(os.path.join(cache_dir, 'maru', '*', '*', '[0-9][0-9][0-9][0-9]', '[0-9][0-9].csv')):
+        partitions.append(('maru', path.split(os.sep)[-3], path))
+    return sorted(partitions, key=lambda partition: partition[2])
+
+
+def compact_frame(kind, code, df):
+    # 자연키 기준으로 마지막 행만 남기고 시간순 정렬 후 품질 플래그를 다시 계산
+    if kind == 'asos':
+        df['날짜'] = pd.to_datetime(df['날짜']).dt.date
+        keys = ASOS_KEYS if '지점' in df.columns else ASOS_KEYS[1:]
+        df = df.drop_duplicates(subset=keys, keep='last').sort_values(['날짜', '시간'], kind='stable')
+        return validate_asos(df, code)
+
+    df['fcstDate'] = pd.to_datetime(df['fcstDate'])
+    df = df.drop_duplicates(subset=FORECAST_KEYS, keep='last').sort_values(FORECAST_KEYS, kind='stable')
+    return validate_forecast(df, region_station(code))
+
+
+def needs_compaction(df, compacted):
+    # 지워진 행이 있거나, 순서가 바뀌었거나, 품질 플래그가 없던 이전 캐시면 다시 씀
+    if not compacted.index.equals(df.index):
+        return True
+    return any(col not in df.columns for col in compacted.columns if col.endswith('_qc'))
+
+
+def cube_target(kind, path):
+    # 파티션 경로 -> (집계 종류, 집계 디렉토리)
+    parts = os.path.normpath(path).split(os.sep)
+    if kind == 'asos':
+        return 'asos', aggregate_cube.sibling_cube_dir(os.sep.join(parts[:-3]))
+    return parts[-4], aggregate_cube.sibling_cube_dir(os.sep.join(parts[:-4]))
+
+
+def compact_partition(partition, dry_run=False):
+    kind, code, path = partition
+    before = os.path.getsize(path)
+    df = pd.read_csv(path, float_precision='round_trip')
+    result = {'kind': kind, 'path': path, 'rows': len(df), 'removed': 0, 'before': before, 'after': before,
+              'rewritten': False}
+    if df.empty:
+        return result
+
+    compacted = compact_frame(kind, code, df.copy())
+    result['removed'] = len(df) - len(compacted)
+    if dry_run:
+        return result
+    if not needs_compaction(df, compacted):
+        # 품질 요약이 없는 이전 파티션은 요약만 추가
+        with partition_lock(path):
+            if not os.path.exists(qc_path(path)):
+                write_partition_quality(path, pd.read_csv(path, float_precision='round_trip'))
+        return result
+
+    cube_kind, cube_dir = cube_target(kind, path)
+
+    def on_commit(merged):
+        write_partition_quality(path, merged)
+        aggregate_cube.update_month(cube_kind, code, merged, cube_dir)
+
+    # 수집 프로세스와 동시에 실행해도 되도록 잠금 안에서 다시 읽어 정리한 뒤 교체 (품질 요약과 일별/월별 집계도 함께 갱신)
+    update_csv(path, None, lambda existing, _: compact_frame(kind, code, existing).reset_index(drop=True),
+               on_commit=on_commit)
+    result['after'] = os.path.getsize(path)
+    result['rewritten'] = True
+    return result
+
+
+def compact_cache(cache_dir='output/cache', max_workers=MAX_WORKERS, dry_run=False):
+    partitions = find_partitions(cache_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(tqdm(executor.map(compact_partition, partitions, [dry_run] * len(partitions)),
+                            total=len(partitions), desc="Compacting cache"))
+
+    summary = pd.DataFrame(results, columns=['kind', 'path', 'rows', 'removed', 'before', 'after', 'rewritten'])
+    if summary.empty:
+        print("No cache partitions found")
+        return summary
+
+    for kind, group in summary.groupby('kind'):
+        reclaimed = group['before'].sum() - group['after'].sum()
+        print(f"{kind}: {len(group)} partitions, {int(group['rewritten'].sum())} rewritten, "
+              f"{int(group['removed'].sum())} duplicate rows removed, {reclaimed / 1024:.1f} KiB reclaimed")
+    if dry_run:
+        print(f"Dry run: {int((summary['removed'] > 0).sum())} partitions have duplicate rows")
+    return summary
+
+
+def main():
+    compact_cache('output/cache')
+
+
+if __name__ == "__main__":
+    main()
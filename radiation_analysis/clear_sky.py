@@ -0,0 +1,125 @@
+import os
+import numpy as np
+import pandas as pd
+from asset_cache import load_assets
+from cache_write import temp_path, commit
+
+KST_OFFSET_HOURS = 9
+SOLAR_CONSTANT = 1353.0  # W/m2
+# 청천일사가 이 값(MJ/m2) 이하인 시간은 야간으로 간주
+NIGHT_THRESHOLD = 0.1
+# 시간 적산값을 구하기 위한 한 시간 내 표본 위치(분)
+SUBSAMPLE_MINUTES = np.array([5, 15, 25, 35, 45, 55])
+
+
+def cos_zenith(lat, lon, times_utc):
+    # lat, lon: (지점,) 도 단위, times_utc: (시간,) -> (지점, 시간)
+    times_utc = pd.DatetimeIndex(times_utc)
+    hour = times_utc.hour.values + times_utc.minute.values / 60
+    gamma = 2 * np.pi / 365 * (times_utc.dayofyear.values - 1 + (hour - 12) / 24)
+
+    decl = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+            - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+            - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                       - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+
+    lat = np.radians(np.asarray(lat, dtype=float))[:, None]
+    lon = np.asarray(lon, dtype=float)[:, None]
+    true_solar_minutes = hour[None, :] * 60 + eqtime[None, :] + 4 * lon
+    hour_angle = np.radians(true_solar_minutes / 4 - 180)
+
+    return np.sin(lat) * np.sin(decl)[None, :] + np.cos(lat) * np.cos(decl)[None, :] * np.cos(hour_angle)
+
+
+def clear_sky_ghi(cosz, altitude_m):
+    # Meinel 직달일사 + 고도 보정, 수평면 전천일사(W/m2)
+    cosz = np.clip(cosz, 0, 1)
+    zenith = np.degrees(np.arccos(cosz))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        air_mass = 1 / (cosz + 0.50572 * np.power(np.maximum(96.07995 - zenith, 1e-6), -1.6364))
+        h = (np.asarray(altitude_m, dtype=float) / 1000)[:, None]
+        dni = SOLAR_CONSTANT * ((1 - 0.14 * h) * np.power(0.7, np.power(air_mass, 0.678)) + 0.14 * h)
+    return np.where(cosz > 0, 1.1 * dni * cosz, 0.0)
+
+
+def hourly_clear_sky(lat, lon, altitude_m, hour_end_kst):
+    # 한 시간 적산 청천일사(MJ/m2), ASOS와 같이 시각은 시간 종료 기준(KST)
+    hour_end_kst = pd.DatetimeIndex(hour_end_kst)
+    start_utc = hour_end_kst - pd.Timedelta(hours=1 + KST_OFFSET_HOURS)
+
+    total = np.zeros((len(np.atleast_1d(lat)), len(hour_end_kst)))
+    for minute in SUBSAMPLE_MINUTES:
+        cosz = cos_zenith(lat, lon, start_utc + pd.Timedelta(minutes=int(minute)))
+        total += clear_sky_ghi(cosz, altitude_m)
+    return (total / len(SUBSAMPLE_MINUTES)) * 0.0036
+
+
+def year_hours(year):
+    return pd.date_range(f'{year}-01-01 00:00', f'{year}-12-31 23:00', freq='h')
+
+
+def load_year(filename, year):
+    # 읽을 수 없거나 길이가 맞지 않는 파일(이전 버전이 쓰다 만 파일 등)은 캐시에 없는 것으로 처리
+    try:
+        table = np.load(filename)
+    except (OSError, ValueError, EOFError):
+        return None
+    return table if len(table) == len(year_hours(year)) else None
+
+
+def save_year(filename, row):
+    # 보고서 프로세스와 수집 프로세스가 동시에 읽으므로 임시 파일에 쓴 뒤 교체
+    tmp = temp_path(filename)
+    with open(tmp, 'wb') as f:
+        np.save(f, row)
+    commit(tmp, filename)
+
+
+def clear_sky_year(stn_ids, year, cache_dir='output/cache/clear_sky'):
+    # (지점, 연도)별로 캐시하고, 캐시에 없는 지점은 한 번의 배열 연산으로 계산
+    stn_ids = [str(stn_id) for stn_id in stn_ids]
+    os.makedirs(cache_dir, exist_ok=True)
+
+    result = {}
+    missing = []
+    for stn_id in stn_ids:
+        table = load_year(os.path.join(cache_dir, f'{stn_id}_{year}.npy'), year)
+        if table is not None:
+            result[stn_id] = table
+        else:
+            missing.append(stn_id)
+
+    if missing:
+        station_by_code = load_assets()['station_by_code']
+        lat = [station_by_code[stn_id]['위도'] for stn_id in missing]
+        lon = [station_by_code[stn_id]['경도'] for stn_id in missing]
+        alt = [station_by_code[stn_id]['고도'] for stn_id in missing]
+
+        values = hourly_clear_sky(lat, lon, alt, year_hours(year)).astype(np.float32)
+        for stn_id, row in zip(missing, values):
+            save_year(os.path.join(cache_dir, f'{stn_id}_{year}.npy'), row)
+            result[stn_id] = row
+    return result
+
+
+def clear_sky_for(stn_id, timestamps, cache_dir='output/cache/clear_sky'):
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    values = np.full(len(timestamps), np.nan)
+    for year in np.unique(timestamps.year):
+        mask = timestamps.year == year
+        table = clear_sky_year([stn_id], year, cache_dir)[str(stn_id)]
+        hour_index = ((timestamps[mask] - pd.Timestamp(f'{year}-01-01')) / pd.Timedelta(hours=1)).astype(int)
+        values[mask] = table[hour_index]
+    return values
+
+
+def add_clear_sky(df, stn_id, obs_col='일사(MJ/m2)', pred_col='예측광량', cache_dir='output/cache/clear_sky'):
+    df = df.copy()
+    df['청천일사'] = clear_sky_for(stn_id, df['tm'], cache_dir)
+    df['주간'] = df['청천일사'] > NIGHT_THRESHOLD
+
+    clear = df['청천일사'].where(df['주간'])
+    df['관측청천지수'] = pd.to_numeric(df[obs_col], errors='coerce') / clear
+    df['예측청천지수'] = pd.to_numeric(df[pred_col], errors='coerce') / clear
+    return df
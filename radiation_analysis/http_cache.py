@@ -0,0 +1,117 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+from datetime import datetime
+import requests
+from cache_write import temp_path, commit
+
+HTTP_CACHE_DIR = 'output/cache/http'
+OPEN_DAY_TTL = 600  # 오늘(아직 끝나지 않은 날) 자료의 보관 시간(초)
+SETTLE_DAYS = 3  # 끝난 뒤 이 일수가 지나야 자료가 확정된 것으로 보고 영구 보관 (늦게 올라오는 자료 반영)
+RECENT_DAY_TTL = 6 * 3600  # 끝났지만 아직 확정되지 않은 날 자료의 보관 시간(초)
+
+# 응답을 구분하는 요청 파라미터 (서비스키 등은 제외)
+KEY_PARAMS = ['stnIds', 'startDt', 'startHh', 'endDt', 'endHh', 'pageNo', 'numOfRows', 'baseDate', 'regCd', 'fcstTime']
+
+
+class CachedResponse:
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def cache_key(url, params):
+    normalized = [url] + [[key, str(params[key])] for key in KEY_PARAMS if key in params]
+    return hashlib.sha256(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+
+def cache_path(key, cache_dir=HTTP_CACHE_DIR):
+    return os.path.join(cache_dir, key[:2], f'{key}.json.gz')
+
+
+def last_day(params):
+    # 요청이 다루는 마지막 날짜 (ASOS: endDt, 날씨마루: baseDate)
+    value = params.get('endDt') or params.get('baseDate')
+    return str(value) if value else None
+
+
+def expires_at(params, now=None):
+    # 끝난 지 SETTLE_DAYS일이 지난 자료는 바뀌지 않으므로 영구 보관, 최근에 끝난 날은 몇 시간, 오늘 자료는 짧게 보관
+    now = now or datetime.now()
+    day = last_day(params)
+    if day is not None:
+        age = (now.date() - datetime.strptime(day[:8], '%Y%m%d').date()).days
+        if age > SETTLE_DAYS:
+            return None
+        if age > 0:
+            return time.time() + RECENT_DAY_TTL
+    return time.time() + OPEN_DAY_TTL
+
+
+def load_cached(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry['expires'] is not None and entry['expires'] < time.time():
+        return None
+    return entry['body']
+
+
+def store(path, url, params, body):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        'url': url,
+        'params': {key: str(params[key]) for key in KEY_PARAMS if key in params},
+        'stored_at': time.time(),
+        'expires': expires_at(params),
+        'body': body,
+    }
+    # 수집기와 웹 작업이 같은 요청을 동시에 저장할 수 있으므로 작성자별 임시 파일 사용
+    tmp = temp_path(path)
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    commit(tmp, path)
+
+
+def cached_get(url, params, is_valid, session=None, timeout=None, cache_dir=HTTP_CACHE_DIR):
+    # 같은 요청은 디스크의 압축된 응답으로 처리하고, 오류/빈 응답은 저장하지 않음
+    path = cache_path(cache_key(url, params), cache_dir)
+    body = load_cached(path)
+    if body is not None:
+        return CachedResponse(body)
+
+    response = (session or requests).get(url, params=params, timeout=timeout)
+    if response.status_code == 200 and is_valid(response.text):
+        store(path, url, params, response.text)
+    return response
+
+
+def asos_body_valid(text):
+    # 잘린 응답을 저장하지 않도록 이 페이지에 와야 할 행 수(totalCount, numOfRows, pageNo 기준)와 비교
+    try:
+        data = json.loads(text)
+        header = data['response']['header']
+        body = data['response']['body']
+        items = body['items']['item']
+        total, rows, page = int(body['totalCount']), int(body['numOfRows']), int(body['pageNo'])
+    except (ValueError, KeyError, TypeError):
+        return False
+    expected = min(rows, total - (page - 1) * rows)
+    return header.get('resultCode') == '00' and len(items) > 0 and len(items) == expected
+
+
+def maru_body_valid(text):
+    try:
+        result = json.loads(text)['result']
+    except (ValueError, KeyError, TypeError):
+        return False
+    return isinstance(result, list) and len(result) > 0
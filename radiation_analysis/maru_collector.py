@@ -0,0 +1,188 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import solar_panel_radiation_download
+import asset_cache
+from cache_write import temp_path, commit
+
+ISSUANCE_TIME = '10:00'  # 날씨마루 예측 발표 시각
+PUBLISH_DELAY = timedelta(minutes=5)  # 발표 후 자료가 올라오기까지 대기
+TIME_BUDGET = timedelta(minutes=20)  # 발표 1회 수집에 허용하는 최대 시간
+MAX_WORKERS = 16
+REQUEST_TIMEOUT = 30
+RETRY_INTERVAL = 30  # 누락 지역 재시도 간격(초)
+MISSING_RECHECK = timedelta(minutes=10)  # 제한 시간 후에도 누락된 지역을 처음 다시 확인하기까지의 간격
+MAX_RECHECK = timedelta(hours=3)  # 계속 비어 있는 지역의 재확인 간격 상한 (간격은 매번 두 배)
+MAX_FAILED_CHECKS = 6  # 이 횟수만큼 연속으로 비어 있으면 해당 발표분은 포기
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def status_path(output_dir):
+    return os.path.join(output_dir, '_status.json')
+
+
+def load_status(output_dir='output/cache/maru'):
+    if os.path.exists(status_path(output_dir)):
+        with open(status_path(output_dir), encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_status(output_dir, status):
+    path = status_path(output_dir)
+    tmp = temp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    commit(tmp, path)
+
+
+def fetch_region(base_date, reg_cd, site, fcst_time):
+    today_df, tomorrow_df = solar_panel_radiation_download.process_weather_data(
+        base_date, reg_cd, site, fcst_time, timeout=REQUEST_TIMEOUT)
+    if today_df.empty and tomorrow_df.empty:
+        return None
+    return today_df, tomorrow_df
+
+
+def new_status(base_date, fcst_time, regions_total):
+    return {
+        'last_issuance': base_date,
+        'fcst_time': fcst_time,
+        'collected_at': None,
+        'regions_total': regions_total,
+        'regions_collected': 0,
+        'regions_committed': [],  # 캐시에 기록을 마친 지역 (재시작해도 다시 받지 않음)
+        'regions_missing': [],
+        'failed_checks': {},  # 지역별 연속 실패 횟수
+        'retry_at': {},  # 지역별 다음 재확인 시각 (실패 횟수가 있는데 없으면 포기한 지역)
+        'attempts': 0,
+    }
+
+
+def save_region(output_dir, reg_cd, today_df, tomorrow_df):
+    if not today_df.empty:
+        solar_panel_radiation_download.save_filtered_data_by_month(today_df, output_dir, 'today', reg_cd)
+    if not tomorrow_df.empty:
+        solar_panel_radiation_download.save_filtered_data_by_month(tomorrow_df, output_dir, 'tomorrow', reg_cd)
+
+
+def schedule_recheck(status, reg_cd, now):
+    # 계속 비어 있는 지역은 재확인 간격을 두 배씩 늘리고, 일정 횟수가 넘으면 그 발표분은 더 요청하지 않음
+    failed = status['failed_checks'].get(reg_cd, 0) + 1
+    status['failed_checks'][reg_cd] = failed
+    if failed >= MAX_FAILED_CHECKS:
+        status['retry_at'].pop(reg_cd, None)
+        return
+    delay = min(MISSING_RECHECK * 2 ** (failed - 1), MAX_RECHECK)
+    status['retry_at'][reg_cd] = (now + delay).strftime(TIME_FORMAT)
+
+
+def due_regions(status, region_names, now):
+    # 아직 기록하지 않았고, 한 번도 실패하지 않았거나 재확인 시각이 된 지역
+    committed = set(status['regions_committed'])
+    now = now.strftime(TIME_FORMAT)
+    targets = {}
+    for reg_cd, site in region_names.items():
+        if reg_cd in committed:
+            continue
+        if reg_cd in status['failed_checks'] and status['retry_at'].get(reg_cd, '9999') > now:
+            continue
+        targets[reg_cd] = site
+    return targets
+
+
+def collect_issuance(base_date, region_names, output_dir='output/cache/maru', fcst_time=1000,
+                     time_budget=TIME_BUDGET, max_workers=MAX_WORKERS, status=None):
+    # 발표 1회분을 전체 지역에 대해 동시에 요청하고, 제한 시간 안에서 누락 지역을 재시도
+    # 지역 하나를 캐시에 기록할 때마다 상태 파일에 남겨, 도중에 종료되어도 기록한 지역은 다시 추가하지 않음
+    if status is None or status.get('last_issuance') != base_date:
+        status = new_status(base_date, fcst_time, len(region_names))
+    deadline = datetime.now() + time_budget
+    committed = set(status['regions_committed'])
+    pending = {reg_cd: site for reg_cd, site in region_names.items() if reg_cd not in committed}
+    attempts = 0
+
+    while pending and datetime.now() < deadline:
+        attempts += 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch_region, base_date, reg_cd, site, fcst_time): reg_cd
+                       for reg_cd, site in pending.items()}
+            for future in as_completed(futures):
+                reg_cd = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error fetching {reg_cd} for {base_date}: {e}")
+                    continue
+                if result is None:
+                    continue
+                save_region(output_dir, reg_cd, *result)
+                committed.add(reg_cd)
+                pending.pop(reg_cd)
+                status['regions_committed'] = sorted(committed)
+                status['failed_checks'].pop(reg_cd, None)
+                status['retry_at'].pop(reg_cd, None)
+                save_status(output_dir, status)
+
+        if pending and datetime.now() + timedelta(seconds=RETRY_INTERVAL) < deadline:
+            print(f"{len(pending)} regions missing for {base_date}, retrying in {RETRY_INTERVAL}s")
+            time.sleep(RETRY_INTERVAL)
+        else:
+            break
+
+    now = datetime.now()
+    for reg_cd in pending:
+        schedule_recheck(status, reg_cd, now)
+    status['collected_at'] = now.strftime(TIME_FORMAT)
+    status['regions_collected'] = len(committed)
+    status['regions_missing'] = sorted((set(status['regions_missing']) - committed) | set(pending))
+    status['attempts'] += attempts
+    save_status(output_dir, status)
+    print(f"Issuance {base_date}: {status['regions_collected']}/{status['regions_total']} regions collected")
+    return status
+
+
+def next_issuance(now, status):
+    # 오늘 발표분을 아직 모두 받지 못했으면 바로 수집, 아니면 다음 날 발표 시각
+    hour, minute = map(int, ISSUANCE_TIME.split(':'))
+    today_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0) + PUBLISH_DELAY
+    if now < today_run:
+        return today_run
+
+    if status.get('last_issuance') != now.strftime('%Y%m%d') or status.get('collected_at') is None:
+        # 새 발표분이거나 이전 수집이 도중에 종료됨
+        return now
+    if status.get('retry_at'):
+        return max(now, datetime.strptime(min(status['retry_at'].values()), TIME_FORMAT))
+    return today_run + timedelta(days=1)
+
+
+def run_collector(output_dir='output/cache/maru'):
+    os.makedirs(output_dir, exist_ok=True)
+    region_names = asset_cache.load_assets()['region_names']
+
+    while True:
+        run_at = next_issuance(datetime.now(), load_status(output_dir))
+        wait = (run_at - datetime.now()).total_seconds()
+        if wait > 0:
+            print(f"Next issuance collection at {run_at:%Y-%m-%d %H:%M}")
+            time.sleep(wait)
+
+        base_date = run_at.strftime('%Y%m%d')
+        status = load_status(output_dir)
+        if status.get('last_issuance') != base_date:
+            status = new_status(base_date, 1000, len(region_names))
+        else:
+            status = {**new_status(base_date, 1000, len(region_names)), **status}
+        # 기록을 마친 지역과 재확인 시각이 되지 않은 지역은 요청하지 않음 (중복 저장 방지)
+        collect_issuance(base_date, due_regions(status, region_names, datetime.now()), output_dir, status=status)
+
+
+def main():
+    run_collector()
+
+
+if __name__ == "__main__":
+    main()
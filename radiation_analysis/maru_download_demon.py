@@ -1,22 +1,24 @@
 import os
+import glob
 import pandas as pd
 import time
 import random
 from tqdm import tqdm
 import solar_panel_radiation_download
+import asset_cache
 
-def preprocess_sitation(stn, reg):
-    reg['sido'] = reg['지역명'].str.split(' ').str[0]
-    reg['sig'] = reg['지역명'].str.split(' ').str[1].str[:-1]
-    station = pd.merge(stn, reg, left_on='지점명', right_on='sig')
-    return station
+def cached_dates(output_dir, prefix, reg_cd):
+    # 이미 저장된 예측 날짜 (재실행 시 같은 날짜를 다시 받아 덧붙이지 않도록)
+    dates = set()
+    for path in glob.glob(os.path.join(output_dir, prefix, str(reg_cd), '*', '*.csv')):
+        dates.update(pd.read_csv(path, usecols=['fcstDate'])['fcstDate'].astype(str).str[:10])
+    return dates
 
 def main():
-    stn = pd.read_excel('../assets/지점코드.xlsx')
-    reg = pd.read_csv('../assets/태양광 발전 예측_지역번호.csv')
-    reg['번호'] = reg['번호'].apply(lambda x: str(x).ljust(10, '0'))
+    assets = asset_cache.load_assets()
+    region_names = assets['region_names']
 
-    reg_cds = reg['번호'].unique()
+    reg_cds = assets['regions']['번호'].unique()
     start_date = '2024-07-01'  # 시작 날짜
     end_date = '2024-07-18'  # 종료 날짜
     base_dates = pd.date_range(start=start_date, end=end_date).strftime('%Y%m%d')
@@ -25,8 +27,14 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
 
     for reg_cd in reg_cds:
-        site = reg[reg['번호'] == reg_cd]['지역명'].values[0]
+        site = region_names[reg_cd]
+        today_dates = cached_dates(output_dir, 'today', reg_cd)
+        tomorrow_dates = cached_dates(output_dir, 'tomorrow', reg_cd)
         for date in tqdm(base_dates):
+            base = pd.Timestamp(date)
+            if base.strftime('%Y-%m-%d') in today_dates and \
+                    (base + pd.Timedelta(days=1)).strftime('%Y-%m-%d') in tomorrow_dates:
+                continue
             try:
                 today_df, tomorrow_df = solar_panel_radiation_download.process_weather_data(date, reg_cd, site)
 
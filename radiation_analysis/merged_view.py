@@ -0,0 +1,180 @@
+import os
+import glob
+import json
+import hashlib
+import pandas as pd
+from tqdm import tqdm
+from solar_panel_radiation_download import merge_forecast
+from station_mapping import load_mapping, nearest_station_pairs
+from cache_write import partition_lock, write_csv, temp_path, commit
+
+LEADS = ['today', 'tomorrow']
+
+
+def view_dir(cache_dir, stn_id, reg_cd):
+    return os.path.join(cache_dir, 'merged', f'{stn_id}_{reg_cd}')
+
+
+def source_months(base_dir):
+    # <base_dir>/<YYYY>/<MM>.csv -> {'YYYY-MM': 경로}
+    months = {}
+    for path in glob.glob(os.path.join(base_dir, '[0-9][0-9][0-9][0-9]', '[0-9][0-9].csv')):
+        year = os.path.basename(os.path.dirname(path))
+        month = os.path.splitext(os.path.basename(path))[0]
+        months[f'{year}-{month}'] = path
+    return months
+
+
+def file_state(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_state(vdir):
+    state_path = os.path.join(vdir, '_state.json')
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'months': {lead: {} for lead in LEADS}}
+
+
+def save_state(vdir, state):
+    state_path = os.path.join(vdir, '_state.json')
+    tmp = temp_path(state_path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    commit(tmp, state_path)
+
+
+def row_times(df, date_col, time_col):
+    return pd.to_datetime(df[date_col].astype(str).str[:10]) + pd.to_timedelta(df[time_col].astype(str) + ':00')
+
+
+def frame_digest(df):
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+def watermark(df, times):
+    # 자료원별 워터마크: 병합에 반영한 마지막 시각과 그 시각까지의 행 요약값
+    if df.empty:
+        return None
+    return {'time': times.max().strftime('%Y-%m-%d %H:%M'), 'digest': frame_digest(df)}
+
+
+def merge_cutoff(marks, sources, view_path):
+    # 모든 자료원에서 워터마크까지의 행이 그대로이면 (뒤에 시각만 추가됨) 두 워터마크 중 이른 시각까지는 병합 결과도 그대로
+    # 워터마크 이전 행이 바뀌었거나(과거 구간 재수집, 중복 플래그 변경 등) 기록이 없으면 None (달 전체를 다시 병합)
+    if not os.path.exists(view_path) or any(marks.get(source) is None for source in sources):
+        return None
+    for source, (df, times) in sources.items():
+        mark = marks[source]
+        if frame_digest(df[times <= pd.Timestamp(mark['time'])]) != mark['digest']:
+            return None
+    return min(pd.Timestamp(mark['time']) for mark in marks.values())
+
+
+def merge_sources(asos, forecast):
+    # 같은 예측 시각이 여러 번 저장된 이전 캐시는 마지막 행만 사용
+    return merge_forecast(asos, forecast.drop_duplicates(subset=['fcstDate', 'fcstTime'], keep='last'))
+
+
+def merge_month(asos, asos_times, forecast, forecast_times, lead, entry, view_path):
+    cutoff = merge_cutoff(entry.get('watermark', {}), {'asos': (asos, asos_times), lead: (forecast, forecast_times)},
+                          view_path)
+    if cutoff is None:
+        return merge_sources(asos, forecast)
+
+    # 워터마크 이후 시각만 병합하여 기존 병합 결과 뒤에 붙임
+    previous = pd.read_csv(view_path, float_precision='round_trip')
+    previous = previous[row_times(previous, '날짜', '시간') <= cutoff]
+    previous['날짜'] = pd.to_datetime(previous['날짜'])
+    added = merge_sources(asos[asos_times > cutoff], forecast[forecast_times > cutoff])
+    return pd.concat([previous, added], ignore_index=True)
+
+
+def update_view(stn_id, reg_cd, cache_dir='output/cache', months=None):
+    # 월별 입력 파일(ASOS, 예측)의 크기/수정 시각이 바뀐 달만, 그 달에서도 자료원별 워터마크 이후 시각만 다시 병합
+    # months: 'YYYY-MM' 목록으로 갱신할 달을 제한 (없으면 전체)
+    stn_id, reg_cd = str(stn_id), str(reg_cd)
+    vdir = view_dir(cache_dir, stn_id, reg_cd)
+    # 같은 지점-지역 뷰를 여러 프로세스가 동시에 갱신하지 않도록 상태 파일 단위로 잠금
+    with partition_lock(os.path.join(vdir, '_state.json')):
+        state = load_state(vdir)
+
+        asos_months = source_months(os.path.join(cache_dir, 'ASOS', stn_id))
+        lead_months = {lead: source_months(os.path.join(cache_dir, 'maru', lead, reg_cd)) for lead in LEADS}
+
+        updated = 0
+        for month in sorted(asos_months):
+            if months is not None and month not in months:
+                continue
+            asos = None
+            for lead in LEADS:
+                if month not in lead_months[lead]:
+                    continue
+                entry = state['months'][lead].get(month, {})
+                current = {'asos': file_state(asos_months[month]), lead: file_state(lead_months[lead][month])}
+                if entry.get('files') == current:
+                    continue
+
+                if asos is None:
+                    asos = pd.read_csv(asos_months[month], float_precision='round_trip')
+                    asos_times = row_times(asos, '날짜', '시간')
+                forecast = pd.read_csv(lead_months[lead][month], float_precision='round_trip')
+                forecast_times = row_times(forecast, 'fcstDate', 'fcstTime')
+
+                year, mm = month.split('-')
+                month_dir = os.path.join(vdir, lead, year)
+                view_path = os.path.join(month_dir, f'{mm}.csv')
+                merged = merge_month(asos, asos_times, forecast, forecast_times, lead, entry, view_path)
+                os.makedirs(month_dir, exist_ok=True)
+                write_csv(merged, view_path)
+
+                state['months'][lead][month] = {
+                    'files': current,
+                    'watermark': {'asos': watermark(asos, asos_times), lead: watermark(forecast, forecast_times)},
+                }
+                updated += 1
+
+        if updated:
+            os.makedirs(vdir, exist_ok=True)
+            save_state(vdir, state)
+    return updated
+
+
+def load_view(stn_id, reg_cd, start_date=None, end_date=None, cache_dir='output/cache'):
+    vdir = view_dir(cache_dir, str(stn_id), str(reg_cd))
+    views = []
+    for lead in LEADS:
+        months = source_months(os.path.join(vdir, lead))
+        if start_date or end_date:
+            first = pd.Timestamp(start_date).strftime('%Y-%m') if start_date else ''
+            last = pd.Timestamp(end_date).strftime('%Y-%m') if end_date else '9999-12'
+            months = {month: path for month, path in months.items() if first <= month <= last}
+
+        frames = [pd.read_csv(months[month]) for month in sorted(months)]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not df.empty and (start_date or end_date):
+            dates = df['날짜'].astype(str).str[:10]
+            if start_date:
+                df = df[dates >= pd.Timestamp(start_date).strftime('%Y-%m-%d')]
+            if end_date:
+                df = df[dates <= pd.Timestamp(end_date).strftime('%Y-%m-%d')]
+        views.append(df.reset_index(drop=True))
+    return tuple(views)
+
+
+def update_all(station, cache_dir='output/cache'):
+    updated = 0
+    for _, pair in tqdm(station.iterrows(), total=len(station), desc="Merged views"):
+        updated += update_view(pair['지점코드'], pair['번호'], cache_dir)
+    print(f"Updated {updated} merged month partitions")
+    return updated
+
+
+def main():
+    update_all(nearest_station_pairs(load_mapping()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from tqdm import tqdm
+from asos_download import plan_requests, fetch_weather_window, create_session, ingest
+from solar_panel_radiation_download import process_weather_data, save_filtered_data_by_month
+from merged_view import update_view, load_view
+from asset_cache import load_assets
+
+MAX_WORKERS = 8
+ASOS_WINDOW_HOURS = 24 * 7  # ASOS 요청 1회가 담당하는 구간 (작을수록 앞쪽 날짜를 빨리 병합)
+
+
+def build_graph(start_date, end_date, window_hours=ASOS_WINDOW_HOURS):
+    # 수집 작업 목록과 날짜별 선행 작업 집합
+    # 날짜 d의 병합은 d를 포함하는 ASOS 구간, 발표일 d(당일 예측), 발표일 d-1(내일 예측)이 끝나야 수행
+    days = pd.date_range(start_date, end_date).date
+    tasks = {}
+    depends = {day: set() for day in days}
+
+    for window_start, window_end in plan_requests(start_date, end_date, window_hours):
+        key = f"asos:{window_start:%Y%m%d%H}"
+        tasks[key] = ('asos', window_start, window_end)
+        for day in pd.date_range(window_start.floor('D'), window_end.floor('D')).date:
+            depends[day].add(key)
+
+    for day in days:
+        key = f"maru:{day:%Y%m%d}"
+        tasks[key] = ('maru', day)
+        depends[day].add(key)
+        next_day = day + pd.Timedelta(days=1)
+        if next_day in depends:
+            depends[next_day].add(key)
+    return tasks, depends
+
+
+def run_task(task, stn_ids, reg_cd, site, cache_dir):
+    # 받은 자료는 바로 캐시에 저장 (파티션 잠금으로 다른 작업과 동시에 써도 안전)
+    if task[0] == 'asos':
+        _, window_start, window_end = task
+        raw = fetch_weather_window(window_start, window_end, stn_ids, create_session())
+        if raw is not None:
+            ingest(raw, stn_ids, os.path.join(cache_dir, 'ASOS'), os.path.join(cache_dir, 'ASOS_raw'))
+        return
+
+    base_date = task[1].strftime('%Y%m%d')
+    today_df, tomorrow_df = process_weather_data(base_date, reg_cd, site)
+    for lead, df in (('today', today_df), ('tomorrow', tomorrow_df)):
+        if not df.empty:
+            save_filtered_data_by_month(df, os.path.join(cache_dir, 'maru'), lead, reg_cd)
+
+
+def run_pipeline(start_date, end_date, stn_ids, reg_cd, cache_dir='output/cache', max_workers=MAX_WORKERS,
+                 window_hours=ASOS_WINDOW_HOURS, on_month=None):
+    # ASOS 구간과 날씨마루 발표일을 동시에 수집하고, 한 달의 날짜가 모두 준비되면 그 달을 바로 병합 뷰에 반영
+    # (날짜마다 갱신하면 그 달의 입력 파일 전체를 매번 다시 확인하므로 달마다 한 번만 갱신)
+    site = load_assets()['region_names'][str(reg_cd)]
+    tasks, depends = build_graph(start_date, end_date, window_hours)
+    pending_days = Counter(day.strftime('%Y-%m') for day in depends)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_task, task, stn_ids, reg_cd, site, cache_dir): key
+                   for key, task in tasks.items()}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching"):
+            key = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                # 실패한 작업은 자료 없음으로 처리하여 의존하는 날짜가 멈추지 않도록 함
+                print(f"Error in {key}: {e}")
+
+            for day in sorted(depends):
+                depends[day].discard(key)
+                if depends[day]:
+                    continue
+                del depends[day]
+                month = day.strftime('%Y-%m')
+                pending_days[month] -= 1
+                if pending_days[month]:
+                    continue
+                updated = update_view(stn_ids, reg_cd, cache_dir, months=[month])
+                if on_month is not None:
+                    on_month(month, updated)
+
+    return load_view(stn_ids, reg_cd, start_date, end_date, cache_dir)
@@ -0,0 +1,182 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from clear_sky import clear_sky_for
+from asset_cache import load_assets
+from station_mapping import load_mapping, nearest_station_pairs
+from cache_write import temp_path, commit
+
+# 품질 플래그 (비트 단위로 조합, 0이면 정상)
+FLAG_MISSING = 1       # 값 없음
+FLAG_NOT_NUMERIC = 2   # 숫자로 변환할 수 없는 값
+FLAG_RANGE = 4         # 물리적 범위를 벗어난 값
+FLAG_DUPLICATE = 8     # 같은 키의 이전 행 (마지막 행만 정상)
+FLAG_NIGHT = 16        # 해가 없는 시간의 일사
+
+# 변수별 물리적 범위 (최소, 최대)
+VALID_RANGES = {
+    '일사(MJ/m2)': (0.0, 5.0),
+    '온도': (-40.0, 45.0),
+    '풍속': (0.0, 60.0),
+    '예측광량': (0.0, 1400.0),  # W/m2
+    '예측온도': (-40.0, 45.0),
+    '예측풍속': (0.0, 60.0),
+}
+
+ASOS_KEYS = ['지점', '날짜', '시간']
+FORECAST_KEYS = ['fcstDate', 'fcstTime']
+
+# 청천일사가 0인(해가 지평선 아래) 시간에 허용하는 최대 일사
+NIGHT_LIMITS = {'일사(MJ/m2)': 0.05, '예측광량': 10.0}
+
+# 월 파티션 '<MM>.csv' 옆에 저장하는 품질 요약 '<MM>.qc.json' (빠진 시각은 CSV에 남지 않으므로 따로 기록)
+QC_SUFFIX = '.qc.json'
+
+_region_stations = {}
+
+
+def qc_column(col):
+    return f'{col}_qc'
+
+
+def hour_timestamps(dates, times):
+    return pd.to_datetime(pd.Series(dates).astype(str).str[:10], format='%Y-%m-%d') + \
+        pd.to_timedelta(pd.Series(times).astype(str) + ':00')
+
+
+def coerce_numeric(values):
+    # 빈 문자열/None은 결측, 나머지 중 변환 실패는 비숫자
+    raw = pd.Series(values)
+    numeric = pd.to_numeric(raw, errors='coerce')
+    empty = raw.isna() | raw.astype(str).str.strip().isin(['', 'nan', 'None'])
+    flags = np.where(empty, FLAG_MISSING, np.where(numeric.isna(), FLAG_NOT_NUMERIC, 0))
+    return numeric.astype(float), flags
+
+
+def missing_hours(timestamps):
+    # 첫 시각과 마지막 시각 사이에서 빠진 정시 목록
+    timestamps = pd.DatetimeIndex(timestamps.dropna().unique())
+    if timestamps.empty:
+        return pd.DatetimeIndex([])
+    expected = pd.date_range(timestamps.min(), timestamps.max(), freq='h')
+    return expected.difference(timestamps)
+
+
+def validate(df, keys, timestamps, stn_id=None):
+    # 배치 전체를 한 번에 검사하여 변수별 '<컬럼>_qc' 플래그를 추가
+    df = df.copy()
+    timestamps = pd.Series(timestamps.values, index=df.index)
+    duplicated = df.duplicated(subset=keys, keep='last').to_numpy()
+
+    clear = None
+    if stn_id is not None and str(stn_id) in load_assets()['station_by_code']:
+        clear = clear_sky_for(stn_id, timestamps)
+
+    summary = {'rows': len(df)}
+    for col, (low, high) in VALID_RANGES.items():
+        if col not in df.columns:
+            continue
+        values, flags = coerce_numeric(df[col])
+        values = values.to_numpy()
+        if clear is not None and col in NIGHT_LIMITS:
+            # ASOS는 야간 일사를 빈 값으로 주므로, 해가 없는 시간의 빈 값만 0으로 채움
+            night_empty = (clear <= 0) & (flags == FLAG_MISSING)
+            values = np.where(night_empty, 0.0, values)
+            flags = np.where(night_empty, 0, flags)
+        with np.errstate(invalid='ignore'):
+            flags = flags | np.where((values < low) | (values > high), FLAG_RANGE, 0)
+            if clear is not None and col in NIGHT_LIMITS:
+                flags = flags | np.where((clear <= 0) & (values > NIGHT_LIMITS[col]), FLAG_NIGHT, 0)
+        flags = flags | np.where(duplicated, FLAG_DUPLICATE, 0)
+
+        df[col] = values
+        df[qc_column(col)] = flags.astype(np.int8)
+        summary[col] = int((flags != 0).sum())
+
+    gaps = missing_hours(timestamps[~duplicated])
+    summary['duplicates'] = int(duplicated.sum())
+    summary['missing_hours'] = len(gaps)
+    df.attrs['quality'] = summary
+    df.attrs['missing_hours'] = [ts.strftime('%Y-%m-%d %H:%M') for ts in gaps]
+    return df
+
+
+def validate_asos(asos, stn_id=None):
+    return validate(asos, ASOS_KEYS, hour_timestamps(asos['날짜'], asos['시간']), stn_id)
+
+
+def validate_forecast(forecast, stn_id=None):
+    return validate(forecast, FORECAST_KEYS, hour_timestamps(forecast['fcstDate'], forecast['fcstTime']), stn_id)
+
+
+def region_station(reg_cd, cache_dir='output/cache'):
+    # 예보 지역에서 가장 가까운 측후소 (예보의 야간 일사 검사에 쓰는 청천일사 기준점)
+    if cache_dir not in _region_stations:
+        nearest = nearest_station_pairs(load_mapping(cache_dir=cache_dir))
+        _region_stations[cache_dir] = dict(zip(nearest['번호'], nearest['지점코드']))
+    return _region_stations[cache_dir].get(str(reg_cd))
+
+
+def partition_timestamps(df):
+    if 'fcstDate' in df.columns:
+        return hour_timestamps(df['fcstDate'], df['fcstTime'])
+    return hour_timestamps(df['날짜'], df['시간'])
+
+
+def partition_quality(df):
+    # 저장된 월 전체 기준 요약: 행 수, 변수별 플래그 행 수, 빠진 시각 목록
+    rows = without_duplicates(df)
+    gaps = missing_hours(partition_timestamps(rows)) if not rows.empty else pd.DatetimeIndex([])
+    summary = {'rows': len(df), 'duplicates': len(df) - len(rows)}
+    for col in VALID_RANGES:
+        if qc_column(col) in df.columns:
+            summary[col] = int((df[qc_column(col)] != 0).sum())
+    summary['missing_hours'] = [ts.strftime('%Y-%m-%d %H:%M') for ts in gaps]
+    return summary
+
+
+def qc_path(path):
+    return os.path.splitext(path)[0] + QC_SUFFIX
+
+
+def write_partition_quality(path, df):
+    # update_csv의 on_commit에서 호출 (파티션 잠금 안에서 CSV와 함께 교체)
+    sidecar = qc_path(path)
+    tmp = temp_path(sidecar)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(partition_quality(df), f, ensure_ascii=False)
+    commit(tmp, sidecar)
+
+
+def read_partition_quality(path):
+    # 품질 요약이 없는 이전 캐시는 CSV에서 다시 계산
+    sidecar = qc_path(path)
+    if os.path.exists(sidecar):
+        with open(sidecar, encoding='utf-8') as f:
+            return json.load(f)
+    return partition_quality(pd.read_csv(path))
+
+
+def partition_missing_hours(paths, start_date=None, end_date=None):
+    # 여러 월 파티션의 빠진 시각을 모아 기간으로 자름
+    gaps = pd.DatetimeIndex(sorted(ts for path in paths for ts in read_partition_quality(path)['missing_hours']))
+    if start_date is not None:
+        gaps = gaps[gaps >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        gaps = gaps[gaps < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+    return gaps
+
+
+def good_values(df, col):
+    # 플래그가 있으면 정상 값만, 없으면(이전 캐시) 숫자 변환 결과를 반환
+    if qc_column(col) in df.columns:
+        return pd.to_numeric(df[col], errors='coerce').where(df[qc_column(col)] == 0)
+    return pd.to_numeric(df[col], errors='coerce')
+
+
+def without_duplicates(df):
+    flag_cols = [qc_column(col) for col in VALID_RANGES if qc_column(col) in df.columns]
+    if not flag_cols:
+        return df
+    return df[(df[flag_cols[0]] & FLAG_DUPLICATE) == 0]
@@ -0,0 +1,225 @@
+import os
+import json
+import html
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from station_mapping import load_mapping, nearest_station_pairs
+from clear_sky import add_clear_sky
+from quality import good_values, partition_missing_hours
+from merged_view import update_view, load_view
+from visualization import calculate_r2_rmse, init_render_worker, render_figures
+
+# 비교 변수: (이름, 관측 컬럼, 예측 컬럼)
+METRIC_VARIABLES = [
+    ('radiation', '일사(MJ/m2)', '예측광량'),
+    ('temp', '온도', '예측온도'),
+    ('wind', '풍속', '예측풍속'),
+]
+
+
+def load_station_pairs(cache_dir='output/cache'):
+    # 지역별로 가장 가까운 측후소를 짝지음
+    station = nearest_station_pairs(load_mapping(cache_dir=cache_dir))
+    return station[['지점코드', '지점명', '번호', '지역명']].drop_duplicates().reset_index(drop=True)
+
+
+def month_files(base_dir, start_date, end_date, ext='csv'):
+    files = []
+    for period in pd.period_range(start_date, end_date, freq='M'):
+        filename = os.path.join(base_dir, str(period.year), f"{period.month:02d}.{ext}")
+        if os.path.exists(filename):
+            files.append(filename)
+    return files
+
+
+def read_files(files):
+    if not files:
+        return pd.DataFrame()
+    return pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+
+
+def pair_inputs(cache_dir, stn_id, reg_cd, start_date, end_date):
+    return {
+        'asos': month_files(os.path.join(cache_dir, 'ASOS', stn_id), start_date, end_date),
+        'today': month_files(os.path.join(cache_dir, 'maru', 'today', reg_cd), start_date, end_date),
+        'tomorrow': month_files(os.path.join(cache_dir, 'maru', 'tomorrow', reg_cd), start_date, end_date),
+    }
+
+
+def fingerprint(inputs, start_date, end_date):
+    # 입력 파일의 크기와 수정 시각으로 변경 여부를 판단
+    files = {}
+    for source, paths in inputs.items():
+        for path in paths:
+            stat = os.stat(path)
+            files[path] = [stat.st_size, stat.st_mtime_ns]
+    return {'start_date': start_date, 'end_date': end_date, 'files': files}
+
+
+def missing_hour_counts(inputs, start_date, end_date):
+    # 수집 시 월 파티션 옆에 기록한 빠진 시각 수 (비교 표본이 줄어든 원인을 함께 보고)
+    return {f'{source}_missing_hours': len(partition_missing_hours(paths, start_date, end_date))
+            for source, paths in inputs.items()}
+
+
+def compute_metrics(merged_today, merged_tomorrow):
+    row = {}
+    for lead, df in (('today', merged_today), ('tomorrow', merged_tomorrow)):
+        for name, obs_col, pred_col in METRIC_VARIABLES:
+            obs = good_values(df, obs_col) if obs_col in df else pd.Series(dtype=float)
+            pred = good_values(df, pred_col) if pred_col in df else pd.Series(dtype=float)
+            valid = obs.notna() & pred.notna()
+            obs, pred = obs[valid], pred[valid]
+
+            row[f'{lead}_{name}_n'] = int(valid.sum())
+            if len(obs) >= 2:
+                r2, rmse = calculate_r2_rmse(obs, pred)
+                row[f'{lead}_{name}_r2'] = r2
+                row[f'{lead}_{name}_rmse'] = rmse
+                row[f'{lead}_{name}_bias'] = float((pred - obs).mean())
+            else:
+                row[f'{lead}_{name}_r2'] = np.nan
+                row[f'{lead}_{name}_rmse'] = np.nan
+                row[f'{lead}_{name}_bias'] = np.nan
+
+        # 야간을 제외한 청천지수(관측/예측 일사 ÷ 청천일사) 오차
+        if '예측청천지수' in df:
+            day = df[df['주간']]
+            error = (day['예측청천지수'] - day['관측청천지수']).dropna()
+            row[f'{lead}_csi_n'] = len(error)
+            row[f'{lead}_csi_rmse'] = float(np.sqrt((error ** 2).mean())) if len(error) else np.nan
+            row[f'{lead}_csi_bias'] = float(error.mean()) if len(error) else np.nan
+    return row
+
+
+def build_pair_report(pair, inputs, start_date, end_date, report_dir, cache_dir='output/cache'):
+    stn_id, reg_cd = pair['지점코드'], pair['번호']
+    pair_dir = os.path.join(report_dir, f"{stn_id}_{reg_cd}")
+
+    if not inputs['asos'] or not inputs['today'] or not inputs['tomorrow']:
+        return None
+
+    # 병합 결과는 월 단위로 저장된 뷰에서 읽음 (입력이 바뀐 달만 다시 병합)
+    update_view(stn_id, reg_cd, cache_dir)
+    merged_today, merged_tomorrow = load_view(stn_id, reg_cd, start_date, end_date, cache_dir)
+    if merged_today.empty or merged_tomorrow.empty:
+        return None
+    merged_today = add_clear_sky(merged_today, stn_id, cache_dir=os.path.join(cache_dir, 'clear_sky'))
+    merged_tomorrow = add_clear_sky(merged_tomorrow, stn_id, cache_dir=os.path.join(cache_dir, 'clear_sky'))
+
+    os.makedirs(pair_dir, exist_ok=True)
+    merged_today.to_csv(os.path.join(pair_dir, 'merged_today.csv'), index=False, encoding='utf-8-sig')
+    merged_tomorrow.to_csv(os.path.join(pair_dir, 'merged_tomorrow.csv'), index=False, encoding='utf-8-sig')
+
+    metrics = {'지점코드': stn_id, '지점명': pair['지점명'], '번호': reg_cd, '지역명': pair['지역명']}
+    metrics.update(compute_metrics(merged_today, merged_tomorrow))
+    metrics.update(missing_hour_counts(inputs, start_date, end_date))
+    pd.DataFrame([metrics]).to_csv(os.path.join(pair_dir, 'metrics.csv'), index=False, encoding='utf-8-sig')
+
+    if not merged_today.empty and not merged_tomorrow.empty:
+        render_figures(merged_today, merged_tomorrow, pair_dir)
+    return metrics
+
+
+def load_manifest(report_dir):
+    manifest_path = os.path.join(report_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(report_dir, manifest):
+    manifest_path = os.path.join(report_dir, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def write_html(metrics_df, report_dir, start_date, end_date):
+    figure_names = ['radiation_scatter', 'radiation_line', 'temp_scatter', 'temp_line', 'wind_scatter', 'wind_line']
+    table = metrics_df.to_html(index=False, float_format=lambda x: f'{x:.3f}', na_rep='-')
+
+    sections = []
+    for _, row in metrics_df.iterrows():
+        pair_name = f"{row['지점코드']}_{row['번호']}"
+        images = ''.join(
+            f'<img src="{pair_name}/{name}.png" width="480">' for name in figure_names
+            if os.path.exists(os.path.join(report_dir, pair_name, f'{name}.png'))
+        )
+        title = html.escape(f"{row['지점명']} ({row['지점코드']}) - {row['지역명']} ({row['번호']})")
+        sections.append(f'<h2 id="{pair_name}">{title}</h2>\n<div>{images}</div>')
+
+    body = '\n'.join(sections)
+    with open(os.path.join(report_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="ko">
+<head><meta charset="utf-8"><title>날씨마루 예측 정확도 보고서</title></head>
+<body>
+<h1>날씨마루 예측 정확도 보고서 ({start_date} ~ {end_date})</h1>
+{table}
+{body}
+</body>
+</html>
+""")
+
+
+def generate_report(station, start_date, end_date, cache_dir='output/cache', report_dir='output/report', max_workers=None):
+    os.makedirs(report_dir, exist_ok=True)
+    manifest = load_manifest(report_dir)
+
+    jobs = {}
+    skipped = []
+    for _, pair in station.iterrows():
+        key = f"{pair['지점코드']}_{pair['번호']}"
+        inputs = pair_inputs(cache_dir, pair['지점코드'], pair['번호'], start_date, end_date)
+        current = fingerprint(inputs, start_date, end_date)
+        metrics_file = os.path.join(report_dir, key, 'metrics.csv')
+
+        # 입력이 변하지 않은 지점은 이전 결과를 재사용
+        if manifest.get(key) == current:
+            if os.path.exists(metrics_file):
+                skipped.append(metrics_file)
+            continue
+        jobs[key] = (pair.to_dict(), inputs, current)
+
+    print(f"Report pairs: {len(jobs)} to build, {len(skipped)} unchanged")
+
+    results = [pd.read_csv(f, dtype={'지점코드': str, '번호': str}) for f in skipped]
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_render_worker) as executor:
+            futures = {executor.submit(build_pair_report, pair, inputs, start_date, end_date, report_dir, cache_dir): key
+                       for key, (pair, inputs, _) in jobs.items()}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Report generation"):
+                key = futures[future]
+                try:
+                    metrics = future.result()
+                except Exception as e:
+                    print(f"Error building report for {key}: {e}")
+                    continue
+                manifest[key] = jobs[key][2]
+                if metrics is not None:
+                    results.append(pd.DataFrame([metrics]))
+
+    save_manifest(report_dir, manifest)
+
+    metrics_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    if not metrics_df.empty:
+        metrics_df = metrics_df.sort_values(['지점코드', '번호']).reset_index(drop=True)
+    metrics_df.to_csv(os.path.join(report_dir, 'metrics.csv'), index=False, encoding='utf-8-sig')
+    write_html(metrics_df, report_dir, start_date, end_date)
+    return metrics_df
+
+
+def main():
+    start_date = '2024-07-01'  # 시작 날짜
+    end_date = '2024-07-16'  # 종료 날짜
+
+    station = load_station_pairs()
+    generate_report(station, start_date, end_date)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from merged_view import merge_sources, update_view, load_view
+
+LEADS = ['today', 'tomorrow']
+MONTHS_PER_SHARD = 12  # 작업 하나가 처리하는 달 수 (너무 작으면 작업당 오버헤드가 커짐)
+
+# 병합에 필요한 키 컬럼 (열 선택 시 항상 함께 읽음)
+ASOS_KEY_COLUMNS = ['날짜', '시간']
+FORECAST_KEY_COLUMNS = ['fcstDate', 'fcstTime']
+
+
+def month_path(base_dir, period):
+    return os.path.join(base_dir, str(period.year), f"{period.month:02d}.csv")
+
+
+def plan_shards(pairs, start_date, end_date, cache_dir='output/cache', months_per_shard=MONTHS_PER_SHARD):
+    # (지점, 지역, 연속된 달 묶음) 단위 작업. 기간 밖의 달과 입력 파일이 없는 달은 읽기 전에 제외
+    periods = list(pd.period_range(start_date, end_date, freq='M'))
+    shards = []
+    for stn_id, reg_cd in pairs:
+        stn_id, reg_cd = str(stn_id), str(reg_cd)
+        for i in range(0, len(periods), months_per_shard):
+            chunk = periods[i:i + months_per_shard]
+            asos_paths = [month_path(os.path.join(cache_dir, 'ASOS', stn_id), period) for period in chunk]
+            asos_paths = [path for path in asos_paths if os.path.exists(path)]
+            if not asos_paths:
+                continue
+            lead_paths = {}
+            for lead in LEADS:
+                paths = [month_path(os.path.join(cache_dir, 'maru', lead, reg_cd), period) for period in chunk]
+                lead_paths[lead] = [path for path in paths if os.path.exists(path)]
+            shards.append((stn_id, reg_cd, str(chunk[0]), asos_paths, lead_paths))
+    return shards
+
+
+def qc_columns(columns):
+    return [f'{col}_qc' for col in columns]
+
+
+def read_months(paths, columns, keys):
+    # 필요한 열만 읽음 (원본에 없는 열은 무시)
+    if columns is None:
+        return concat_frames([pd.read_csv(path) for path in paths])
+    wanted = set(keys + columns + qc_columns(columns))
+    return concat_frames([pd.read_csv(path, usecols=lambda col: col in wanted) for path in paths])
+
+
+def filter_dates(df, start_date, end_date):
+    dates = df['날짜'].astype(str).str[:10]
+    return df[(dates >= pd.Timestamp(start_date).strftime('%Y-%m-%d')) &
+              (dates <= pd.Timestamp(end_date).strftime('%Y-%m-%d'))]
+
+
+def merge_shard(shard, start_date, end_date, asos_columns=None, forecast_columns=None):
+    # 묶음 안의 관측/예측만 읽어 병합 (병합 키가 날짜/시간이므로 묶음 사이에 걸치는 행이 없음)
+    stn_id, reg_cd, first_month, asos_paths, lead_paths = shard
+    asos = filter_dates(read_months(asos_paths, asos_columns, ASOS_KEY_COLUMNS), start_date, end_date)
+    merged = {}
+    for lead in LEADS:
+        if not lead_paths[lead] or asos.empty:
+            merged[lead] = pd.DataFrame()
+            continue
+        forecast = read_months(lead_paths[lead], forecast_columns, FORECAST_KEY_COLUMNS)
+        merged[lead] = merge_sources(asos, forecast)
+    return stn_id, reg_cd, first_month, merged
+
+
+def merge_range(pairs, start_date, end_date, cache_dir='output/cache', max_workers=None,
+                asos_columns=None, forecast_columns=None, months_per_shard=MONTHS_PER_SHARD):
+    # 묶음 작업을 모든 코어에 분배한 뒤 지점-지역별로 월 순서대로 합침
+    # 코어가 하나면 프로세스 간 전달 비용만 늘어나므로 현재 프로세스에서 차례로 처리
+    shards = plan_shards(pairs, start_date, end_date, cache_dir, months_per_shard)
+    parts = {}
+    if (max_workers or os.cpu_count() or 1) == 1:
+        results = (merge_shard(shard, start_date, end_date, asos_columns, forecast_columns) for shard in shards)
+        for stn_id, reg_cd, month, merged in tqdm(results, total=len(shards), desc="Merging shards"):
+            parts.setdefault((stn_id, reg_cd), []).append((month, merged))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(merge_shard, shard, start_date, end_date, asos_columns, forecast_columns)
+                       for shard in shards]
+            for future in tqdm(futures, total=len(futures), desc="Merging shards"):
+                stn_id, reg_cd, month, merged = future.result()
+                parts.setdefault((stn_id, reg_cd), []).append((month, merged))
+
+    results = {}
+    for pair, months in parts.items():
+        months.sort(key=lambda item: item[0])
+        results[pair] = tuple(concat_frames([merged[lead] for _, merged in months]) for lead in LEADS)
+    return results
+
+
+def concat_frames(frames):
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def view_pair(stn_id, reg_cd, start_date, end_date, cache_dir='output/cache'):
+    # 운영 경로: 병합 뷰를 갱신한 뒤 기간을 읽음 (결과 비교 기준)
+    update_view(stn_id, reg_cd, cache_dir)
+    return load_view(stn_id, reg_cd, start_date, end_date, cache_dir)
+
+
+def normalize(df):
+    # 뷰는 CSV에서 읽으므로 날짜가 문자열, 묶음 병합 결과는 datetime
+    if df.empty:
+        return df.reset_index(drop=True)
+    df = df.assign(날짜=df['날짜'].astype(str).str[:10])
+    return df.sort_values(['날짜', '시간'], kind='stable').reset_index(drop=True)
+
+
+def same_frames(expected, actual):
+    try:
+        pd.testing.assert_frame_equal(normalize(expected), normalize(actual), check_dtype=False)
+    except AssertionError as e:
+        return str(e)
+    return None
+
+
+def verify(pairs, start_date, end_date, cache_dir='output/cache', max_workers=None):
+    # 병렬 결과가 병합 뷰(merged_view)의 결과와 같은지 확인
+    results = merge_range(pairs, start_date, end_date, cache_dir, max_workers)
+    mismatched = []
+    for stn_id, reg_cd in pairs:
+        expected = view_pair(stn_id, reg_cd, start_date, end_date, cache_dir)
+        actual = results.get((str(stn_id), str(reg_cd)), (pd.DataFrame(), pd.DataFrame()))
+        for lead, exp, act in zip(LEADS, expected, actual):
+            error = same_frames(exp, act)
+            if error is not None:
+                mismatched.append((stn_id, reg_cd, lead, error))
+    return mismatched
+
+
+def write_synthetic_cache(cache_dir, pairs, start_date, end_date, seed=0):
+    # 벤치마크용 캐시 (실제 캐시와 같은 컬럼/폴더 구성)
+    rng = np.random.default_rng(seed)
+    for period in tqdm(pd.period_range(start_date, end_date, freq='M'), desc="Synthetic cache"):
+        tm = pd.date_range(period.start_time, period.end_time.floor('h'), freq='h')
+        n = len(tm)
+        base = {'날짜': tm.strftime('%Y-%m-%d'), '시간': tm.strftime('%H:%M')}
+        for stn_id in sorted({stn for stn, _ in pairs}):
+            asos = pd.DataFrame({'지점': stn_id, **base,
+                                 '일사(MJ/m2)': np.round(rng.random(n) * 3, 2), '온도': np.round(rng.random(n) * 30, 1),
+                                 '풍속': np.round(rng.random(n) * 5, 1), 'tm': tm.strftime('%Y-%m-%d %H:%M')})
+            for col in ['일사(MJ/m2)', '온도', '풍속']:
+                asos[f'{col}_qc'] = 0
+            path = month_path(os.path.join(cache_dir, 'ASOS', stn_id), period)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            asos.to_csv(path, index=False, encoding='utf-8-sig')
+        for reg_cd in sorted({reg for _, reg in pairs}):
+            for lead in LEADS:
+                forecast = pd.DataFrame({'fcstDate': base['날짜'], 'fcstTime': base['시간'],
+                                         '예측광량': np.round(rng.random(n) * 800, 1), '지역코드': reg_cd,
+                                         '예측온도': np.round(rng.random(n) * 30, 1),
+                                         '예측풍속': np.round(rng.random(n) * 5, 1),
+                                         'tm': tm.strftime('%Y-%m-%d %H:%M:%S'), '지역명': reg_cd})
+                for col in ['예측광량', '예측온도', '예측풍속']:
+                    forecast[f'{col}_qc'] = 0
+                path = month_path(os.path.join(cache_dir, 'maru', lead, reg_cd), period)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                forecast.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def benchmark(pairs, start_date, end_date, cache_dir=None, max_workers=None, projection=True):
+    # 병합 뷰(처음부터 만드는 경우)와 묶음 단위 병렬 방식의 처리 시간 비교
+    temp_dir = None
+    if cache_dir is None:
+        temp_dir = tempfile.mkdtemp()
+        cache_dir = temp_dir
+        write_synthetic_cache(cache_dir, pairs, start_date, end_date)
+
+    try:
+        started = time.perf_counter()
+        expected = {(str(stn), str(reg)): view_pair(stn, reg, start_date, end_date, cache_dir)
+                    for stn, reg in tqdm(pairs, desc="merged view")}
+        view_seconds = time.perf_counter() - started
+
+        # 이미 만들어진 뷰에서 기간만 읽는 경우
+        started = time.perf_counter()
+        for stn, reg in pairs:
+            load_view(stn, reg, start_date, end_date, cache_dir)
+        warm_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = merge_range(pairs, start_date, end_date, cache_dir, max_workers)
+        shard_seconds = time.perf_counter() - started
+
+        identical = all(
+            same_frames(exp, act) is None
+            for pair in expected for exp, act in zip(expected[pair], actual.get(pair, (pd.DataFrame(),) * 2)))
+        rows = sum(len(df) for frames in expected.values() for df in frames)
+        print(f"{len(pairs)} pairs, {start_date} ~ {end_date}, {rows} merged rows")
+        print(f"merged view: {view_seconds:.1f}s (built), {warm_seconds:.1f}s (already built), "
+              f"shards ({max_workers or os.cpu_count()} workers): {shard_seconds:.1f}s, identical: {identical}")
+
+        if projection:
+            # 분석에 필요한 열만 읽는 경우 (일사 비교)
+            started = time.perf_counter()
+            merge_range(pairs, start_date, end_date, cache_dir, max_workers,
+                        asos_columns=['일사(MJ/m2)'], forecast_columns=['예측광량'])
+            print(f"shards, radiation columns only: {time.perf_counter() - started:.1f}s")
+        return {'view': view_seconds, 'view_warm': warm_seconds, 'shards': shard_seconds, 'identical': identical}
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    # 전체 지역(지역별 최근접 측후소) x 5년 규모 벤치마크. 인자로 지역 수를 줄일 수 있음
+    from station_mapping import load_mapping, nearest_station_pairs
+    station = nearest_station_pairs(load_mapping())
+    pairs = list(zip(station['지점코드'].astype(str), station['번호'].astype(str)))
+    if len(sys.argv) > 1:
+        pairs = pairs[:int(sys.argv[1])]
+    benchmark(pairs, '2019-07-01', '2024-06-30')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,21 @@
-import requests
+import http_cache
 import pandas as pd
 import json
 import os
 from datetime import datetime, timedelta
+from quality import validate_forecast, without_duplicates, region_station, write_partition_quality
+from cache_write import update_csv
+import aggregate_cube
 
-def fetch_forecast_data(base_date, reg_cd):
+def fetch_forecast_data(base_date, reg_cd, fcst_time=1000, timeout=None):
     url = "https://bd.kma.go.kr/kma2020/energy/energyGeneration.do"
     params = {
         'baseDate': base_date,
-        'fcstTime': 1000,
+        'fcstTime': fcst_time,
         'regCd': reg_cd
     }
 
-    response = requests.get(url, params=params)
+    response = http_cache.cached_get(url, params, http_cache.maru_body_valid, timeout=timeout)
 
     if response.status_code == 200:
         data = response.text
@@ -34,8 +37,8 @@ def fetch_forecast_data(base_date, reg_cd):
     else:
         return pd.DataFrame(), pd.DataFrame()
 
-def process_weather_data(base_date, reg_cd, site):
-    today, tomorrow = fetch_forecast_data(base_date, reg_cd)
+def process_weather_data(base_date, reg_cd, site, fcst_time=1000, timeout=None):
+    today, tomorrow = fetch_forecast_data(base_date, reg_cd, fcst_time, timeout)
 
     if today.empty and tomorrow.empty:
         return pd.DataFrame(), pd.DataFrame()
@@ -66,7 +69,29 @@ def process_weather_data(base_date, reg_cd, site):
 
     return today, tomorrow
 
+def merge_forecast(asos, forecast_df):
+    asos = asos.drop(columns=['year', 'month'], errors='ignore').copy()
+    asos['날짜'] = pd.to_datetime(asos['날짜'])
+    forecast_df = without_duplicates(forecast_df).drop(columns=['tm', 'year', 'month'], errors='ignore').copy()
+    forecast_df['fcstDate'] = pd.to_datetime(forecast_df['fcstDate'])
+
+    merged = pd.merge(asos, forecast_df, left_on=['날짜', '시간'], right_on=['fcstDate', 'fcstTime'],
+                      how='inner').dropna(subset=['일사(MJ/m2)'])
+    merged['예측광량'] = pd.to_numeric(merged['예측광량'], errors='coerce') * 0.0036
+    return merged.drop(columns=['fcstDate', 'fcstTime'])
+
+def merge_data(asos, today_df, tomorrow_df):
+    return merge_forecast(asos, today_df), merge_forecast(asos, tomorrow_df)
+
+def append_forecast(existing, df, stn_id=None):
+    if existing is not None:
+        df = pd.concat([existing, df], ignore_index=True)
+    return validate_forecast(df, stn_id)
+
+
 def save_filtered_data_by_month(df, output_dir, prefix, reg_cd):
+    cube_dir = aggregate_cube.sibling_cube_dir(output_dir)
+    stn_id = region_station(reg_cd)  # 야간 일사 검사 기준 측후소
     df['year'] = df['fcstDate'].dt.year.astype(str)
     df['month'] = df['fcstDate'].dt.month.astype(str).str.zfill(2)
 
@@ -75,11 +100,13 @@ def save_filtered_data_by_month(df, output_dir, prefix, reg_cd):
         os.makedirs(year_dir, exist_ok=True)
         file_name = os.path.join(year_dir, f"{month}.csv")
 
-        if os.path.exists(file_name):
-            existing_df = pd.read_csv(file_name)
-            group = pd.concat([existing_df, group], ignore_index=True)
+        def on_commit(merged):
+            write_partition_quality(file_name, merged)
+            aggregate_cube.update_month(prefix, reg_cd, merged, cube_dir)
 
-        group.to_csv(file_name, index=False, encoding='utf-8-sig')
+        # 월 전체를 다시 검사하여 반복 수집으로 생긴 중복 행도 플래그로 표시
+        update_csv(file_name, group, lambda existing, new: append_forecast(existing, new, stn_id),
+                   on_commit=on_commit, parse_dates=['fcstDate'], dtype={'year': str, 'month': str})
         # print(f"Saved cache: {file_name}")
 
 def main():
@@ -0,0 +1,99 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from asset_cache import STATION_PATH, REGION_PATH, file_checksum, load_assets
+
+EARTH_RADIUS_KM = 6371.0
+
+# 지역 대표 좌표 (번호, 지역명, 위도, 경도). 시·군·구청 위치
+CENTROID_PATH = '../assets/지역좌표.csv'
+
+def to_unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    # 단위 구 위의 직선거리를 대원거리로 변환
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def region_centroids(reg, centroid_path=CENTROID_PATH):
+    reg = reg.copy()
+    reg['번호'] = reg['번호'].apply(lambda x: str(x).ljust(10, '0'))
+    reg = reg.drop_duplicates('번호')
+
+    centroids = pd.read_csv(centroid_path)
+    centroids['번호'] = centroids['번호'].apply(lambda x: str(x).ljust(10, '0'))
+    reg = reg.merge(centroids[['번호', '위도', '경도']].drop_duplicates('번호'), on='번호', how='left')
+
+    # 좌표가 없는 지역이 있으면 매핑을 만들지 않음 (좌표 파일에 지역을 추가해야 함)
+    missing = reg[reg['위도'].isna() | reg['경도'].isna()]
+    if not missing.empty:
+        raise ValueError(f"No coordinates in {centroid_path} for {len(missing)} regions: "
+                         f"{', '.join(missing['지역명'].head(10))}")
+    return reg[['번호', '지역명', '위도', '경도']].reset_index(drop=True)
+
+
+def build_mapping(stn, regions, k=3):
+    # 측후소 좌표로 KD-tree를 만들고 전체 지역을 한 번에 질의
+    tree = cKDTree(to_unit_vectors(stn['위도'], stn['경도']))
+    k = min(k, len(stn))
+    chord, idx = tree.query(to_unit_vectors(regions['위도'], regions['경도']), k=k)
+    chord = chord.reshape(len(regions), k)
+    idx = idx.reshape(len(regions), k)
+
+    distance = chord_to_km(chord)
+    inverse = 1.0 / np.maximum(distance, 1e-3)
+    weight = inverse / inverse.sum(axis=1, keepdims=True)
+
+    mapping = pd.DataFrame({
+        '번호': np.repeat(regions['번호'].values, k),
+        '지역명': np.repeat(regions['지역명'].values, k),
+        'rank': np.tile(np.arange(1, k + 1), len(regions)),
+        '지점코드': stn['지점코드'].astype(str).values[idx.ravel()],
+        '지점명': stn['지점명'].values[idx.ravel()],
+        'distance_km': distance.ravel(),
+        'weight': weight.ravel(),
+    })
+    return mapping
+
+
+def load_mapping(k=3, cache_dir='output/cache', stn_path=STATION_PATH, reg_path=REGION_PATH,
+                 centroid_path=CENTROID_PATH):
+    # 자산 파일의 checksum이 같으면 디스크에 저장된 매핑을 그대로 사용
+    checksum = file_checksum([stn_path, reg_path, centroid_path])
+    mapping_path = os.path.join(cache_dir, 'station_mapping.csv')
+    meta_path = os.path.join(cache_dir, 'station_mapping.json')
+
+    if os.path.exists(mapping_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('checksum') == checksum and meta.get('k') == k:
+            return pd.read_csv(mapping_path, dtype={'번호': str, '지점코드': str})
+
+    assets = load_assets(os.path.join(cache_dir, 'assets.pkl'), stn_path, reg_path)
+    stn, reg = assets['stations'], assets['regions']
+    mapping = build_mapping(stn, region_centroids(reg, centroid_path), k)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    mapping.to_csv(mapping_path, index=False, encoding='utf-8-sig')
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'checksum': checksum, 'k': k}, f)
+    return mapping
+
+
+def nearest_station_pairs(mapping):
+    return mapping[mapping['rank'] == 1].reset_index(drop=True)
+
+
+def main():
+    mapping = load_mapping()
+    print(nearest_station_pairs(mapping))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from scipy import stats
 from sklearn.metrics import mean_squared_error, r2_score
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from quality import good_values
 
 def set_korean_font():
     plt.rcParams['font.family'] = 'Malgun Gothic'
@@ -14,13 +18,41 @@ def calculate_r2_rmse(y_true, y_pred):
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
     return r2, rmse
 
+NUMERIC_COLUMNS = ['일사(MJ/m2)', '예측광량', '온도', '예측온도', '풍속', '예측풍속']
+
+# 그래프 이름: (종류, 관측 컬럼, 예측 컬럼, 축 여백)
+FIGURES = {
+    'radiation_scatter': ('scatter', '일사(MJ/m2)', '예측광량', None),
+    'temp_scatter': ('scatter', '온도', '예측온도', 2),
+    'radiation_line': ('line', '일사(MJ/m2)', '예측광량', None),
+    'temp_line': ('line', '온도', '예측온도', None),
+    'wind_scatter': ('scatter', '풍속', '예측풍속', 1),
+    'wind_line': ('line', '풍속', '예측풍속', None),
+}
+
+# 점이 이보다 많으면 개별 점 대신 hexbin 밀도로 표시
+DENSITY_THRESHOLD = 5000
+FIT_LEVEL = 0.95  # 회귀선 신뢰구간
+
+def add_timestamp(df):
+    df['timestamp'] = pd.to_datetime(df['날짜'].astype(str).str[:10], format='%Y-%m-%d') + \
+                      pd.to_timedelta(df['시간'].astype(str) + ':00')
+    return df
+
 def filter_by_date_range(df, start_date, end_date):
-    df['timestamp'] = pd.to_datetime(df['날짜'].astype(str) + ' ' + df['시간'])
+    if 'timestamp' not in df.columns:
+        df = add_timestamp(df.copy())
     if start_date:
         start_date = pd.to_datetime(start_date)
     if end_date:
         end_date = pd.to_datetime(end_date)
 
+    # 시간순 정렬된 경우 전체 비교 대신 이진 탐색으로 구간만 잘라냄
+    if df['timestamp'].is_monotonic_increasing:
+        lo = df['timestamp'].searchsorted(start_date, side='left') if start_date else 0
+        hi = df['timestamp'].searchsorted(end_date, side='right') if end_date else len(df)
+        return df.iloc[lo:hi]
+
     if start_date and end_date:
         df = df[(df['timestamp'] >= start_date) & (df['timestamp'] <= end_date)]
     elif start_date:
@@ -29,141 +61,94 @@ def filter_by_date_range(df, start_date, end_date):
         df = df[df['timestamp'] <= end_date]
     return df
 
-def radiation_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
-    set_korean_font()
-
-    today['일사(MJ/m2)'] = pd.to_numeric(today['일사(MJ/m2)'], errors='coerce')
-    today['예측광량'] = pd.to_numeric(today['예측광량'], errors='coerce')
-    tomorrow['일사(MJ/m2)'] = pd.to_numeric(tomorrow['일사(MJ/m2)'], errors='coerce')
-    tomorrow['예측광량'] = pd.to_numeric(tomorrow['예측광량'], errors='coerce')
-
-    today = today.dropna(subset=['일사(MJ/m2)', '예측광량'])
-    tomorrow = tomorrow.dropna(subset=['일사(MJ/m2)', '예측광량'])
-
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
-
-    fig, ax = plt.subplots(1, 2, figsize=(12, 6))
-
-    sns.regplot(data=today, x='일사(MJ/m2)', y='예측광량', ax=ax[0], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
-    sns.regplot(data=tomorrow, x='일사(MJ/m2)', y='예측광량', ax=ax[1], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
-
-    today_r2, today_rmse = calculate_r2_rmse(today['일사(MJ/m2)'], today['예측광량'])
-    tomorrow_r2, tomorrow_rmse = calculate_r2_rmse(tomorrow['일사(MJ/m2)'], tomorrow['예측광량'])
-
-    ax[0].set_title(f'Today (R²={today_r2:.2f}, RMSE={today_rmse:.2f})')
-    ax[1].set_title(f'Tomorrow (R²={tomorrow_r2:.2f}, RMSE={tomorrow_rmse:.2f})')
-
-    max_value = max(today['일사(MJ/m2)'].max(), tomorrow['일사(MJ/m2)'].max(), today['예측광량'].max(), tomorrow['예측광량'].max())
-
-    for a in ax:
-        a.set_xlim(0, max_value)
-        a.set_ylim(0, max_value)
-        a.plot([0, max_value], [0, max_value], ls='--', color='black')
-        a.set_aspect('equal', adjustable='box')
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'radiation_scatter.png'))
-
-def temp_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
-    set_korean_font()
-
-    today['온도'] = pd.to_numeric(today['온도'], errors='coerce')
-    today['예측온도'] = pd.to_numeric(today['예측온도'], errors='coerce')
-    tomorrow['온도'] = pd.to_numeric(tomorrow['온도'], errors='coerce')
-    tomorrow['예측온도'] = pd.to_numeric(tomorrow['예측온도'], errors='coerce')
-
-    today = today.dropna(subset=['온도', '예측온도'])
-    tomorrow = tomorrow.dropna(subset=['온도', '예측온도'])
-
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
-
-    fig, ax = plt.subplots(1, 2, figsize=(12, 6))
-
-    sns.regplot(data=today, x='온도', y='예측온도', ax=ax[0], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
-    sns.regplot(data=tomorrow, x='온도', y='예측온도', ax=ax[1], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
-
-    today_r2, today_rmse = calculate_r2_rmse(today['온도'], today['예측온도'])
-    tomorrow_r2, tomorrow_rmse = calculate_r2_rmse(tomorrow['온도'], tomorrow['예측온도'])
-
-    ax[0].set_title(f'Today (R²={today_r2:.2f}, RMSE={today_rmse:.2f})')
-    ax[1].set_title(f'Tomorrow (R²={tomorrow_r2:.2f}, RMSE={tomorrow_rmse:.2f})')
-
-    max_value = max(today['온도'].max(), tomorrow['온도'].max(), today['예측온도'].max(), tomorrow['예측온도'].max())
-    min_value = max(today['온도'].min(), tomorrow['온도'].min(), today['예측온도'].min(), tomorrow['예측온도'].min())
-
-    for a in ax:
-        a.set_xlim(abs(min_value) - 2, abs(max_value) + 2)
-        a.set_ylim(abs(min_value) - 2, abs(max_value) + 2)
-        a.plot([min_value, max_value], [min_value, max_value], ls='--', color='black')
-        a.set_aspect('equal', adjustable='box')
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'temp_scatter.png'))
-
-
-def wind_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
-    set_korean_font()
-
-    today['풍속'] = pd.to_numeric(today['풍속'], errors='coerce')
-    today['예측풍속'] = pd.to_numeric(today['예측풍속'], errors='coerce')
-    tomorrow['풍속'] = pd.to_numeric(tomorrow['풍속'], errors='coerce')
-    tomorrow['예측풍속'] = pd.to_numeric(tomorrow['예측풍속'], errors='coerce')
-
-    today = today.dropna(subset=['풍속', '예측풍속'])
-    tomorrow = tomorrow.dropna(subset=['풍속', '예측풍속'])
+def prepare_data(df, start_date=None, end_date=None):
+    # 날짜 필터링과 숫자 변환을 한 번만 수행하여 모든 그래프에서 재사용
+    df = filter_by_date_range(add_timestamp(df.copy()), start_date, end_date).copy()
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = good_values(df, col)
+    return df
 
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
+def save_figure(fig, output_dir, name):
+    try:
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, f'{name}.png'))
+    finally:
+        plt.close(fig)
+
+def fit_line(x, y, grid, level=FIT_LEVEL):
+    # 최소제곱 직선과 평균 예측값의 신뢰구간 (부트스트랩 대신 닫힌 식으로 계산)
+    n = len(x)
+    x_mean = x.mean()
+    sxx = ((x - x_mean) ** 2).sum()
+    slope = ((x - x_mean) * (y - y.mean())).sum() / sxx
+    intercept = y.mean() - slope * x_mean
+    fitted = intercept + slope * grid
+
+    residual = y - (intercept + slope * x)
+    s = np.sqrt((residual ** 2).sum() / (n - 2))
+    half_width = stats.t.ppf((1 + level) / 2, n - 2) * s * np.sqrt(1 / n + (grid - x_mean) ** 2 / sxx)
+    return fitted, fitted - half_width, fitted + half_width
+
+def scatter_panel(ax, df, obs_col, pred_col):
+    x = df[obs_col].to_numpy(dtype=float)
+    y = df[pred_col].to_numpy(dtype=float)
+    if len(x) > DENSITY_THRESHOLD:
+        ax.hexbin(x, y, gridsize=60, bins='log', mincnt=1, cmap='Greys')
+    else:
+        ax.scatter(x, y, s=50, color='black', alpha=0.6)
+
+    if len(x) > 2 and np.ptp(x) > 0:
+        grid = np.linspace(x.min(), x.max(), 100)
+        fitted, lower, upper = fit_line(x, y, grid)
+        ax.fill_between(grid, lower, upper, color='red', alpha=0.15, linewidth=0)
+        ax.plot(grid, fitted, color='red')
+    ax.set_xlabel(obs_col)
+    ax.set_ylabel(pred_col)
+
+def scatter_figure(today, tomorrow, obs_col, pred_col, margin=None):
+    today = today.dropna(subset=[obs_col, pred_col])
+    tomorrow = tomorrow.dropna(subset=[obs_col, pred_col])
 
     fig, ax = plt.subplots(1, 2, figsize=(12, 6))
 
-    sns.regplot(data=today, x='풍속', y='예측풍속', ax=ax[0], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
-    sns.regplot(data=tomorrow, x='풍속', y='예측풍속', ax=ax[1], scatter_kws={'s': 50, 'color': 'black', 'alpha': 0.6},
-                line_kws={'color': 'red'})
+    scatter_panel(ax[0], today, obs_col, pred_col)
+    scatter_panel(ax[1], tomorrow, obs_col, pred_col)
 
-    today_r2, today_rmse = calculate_r2_rmse(today['풍속'], today['예측풍속'])
-    tomorrow_r2, tomorrow_rmse = calculate_r2_rmse(tomorrow['풍속'], tomorrow['예측풍속'])
+    today_r2, today_rmse = calculate_r2_rmse(today[obs_col], today[pred_col])
+    tomorrow_r2, tomorrow_rmse = calculate_r2_rmse(tomorrow[obs_col], tomorrow[pred_col])
 
     ax[0].set_title(f'Today (R²={today_r2:.2f}, RMSE={today_rmse:.2f})')
     ax[1].set_title(f'Tomorrow (R²={tomorrow_r2:.2f}, RMSE={tomorrow_rmse:.2f})')
 
-    max_value = max(today['풍속'].max(), tomorrow['풍속'].max(), today['예측풍속'].max(), tomorrow['예측풍속'].max())
-    min_value = max(today['풍속'].min(), tomorrow['풍속'].min(), today['예측풍속'].min(), tomorrow['예측풍속'].min())
+    max_value = max(today[obs_col].max(), tomorrow[obs_col].max(), today[pred_col].max(), tomorrow[pred_col].max())
+    min_value = max(today[obs_col].min(), tomorrow[obs_col].min(), today[pred_col].min(), tomorrow[pred_col].min())
 
     for a in ax:
-        a.set_xlim(abs(min_value) - 1, abs(max_value) + 1)
-        a.set_ylim(abs(min_value) - 1, abs(max_value) + 1)
-        a.plot([min_value, max_value], [min_value, max_value], ls='--', color='black')
+        if margin is None:
+            a.set_xlim(0, max_value)
+            a.set_ylim(0, max_value)
+            a.plot([0, max_value], [0, max_value], ls='--', color='black')
+        else:
+            a.set_xlim(abs(min_value) - margin, abs(max_value) + margin)
+            a.set_ylim(abs(min_value) - margin, abs(max_value) + margin)
+            a.plot([min_value, max_value], [min_value, max_value], ls='--', color='black')
         a.set_aspect('equal', adjustable='box')
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'wind_scatter.png'))
-
-
-def radiation_line(today, tomorrow, output_dir, start_date=None, end_date=None):
-    set_korean_font()
-
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
+    return fig
 
+def line_figure(today, tomorrow, obs_col, pred_col):
     fig, ax = plt.subplots(2, 1, figsize=(14, 14))
 
-    sns.lineplot(data=today, x='timestamp', y='예측광량', ax=ax[0], label='predict', lw=2.2)
-    sns.lineplot(data=today, x='timestamp', y='일사(MJ/m2)', ax=ax[0], label='ASOS', lw=2.2)
+    sns.lineplot(data=today, x='timestamp', y=pred_col, ax=ax[0], label='predict', lw=2.2)
+    sns.lineplot(data=today, x='timestamp', y=obs_col, ax=ax[0], label='ASOS', lw=2.2)
     ax[0].set_title('Today')
     ax[0].set_xlabel('Timestamp')
     ax[0].set_ylabel('Radiation')
     ax[0].legend(loc='upper left')
 
-    sns.lineplot(data=tomorrow, x='timestamp', y='예측광량', ax=ax[1], label='predict', lw=2.2)
-    sns.lineplot(data=tomorrow, x='timestamp', y='일사(MJ/m2)', ax=ax[1], label='ASOS', lw=2.2)
+    sns.lineplot(data=tomorrow, x='timestamp', y=pred_col, ax=ax[1], label='predict', lw=2.2)
+    sns.lineplot(data=tomorrow, x='timestamp', y=obs_col, ax=ax[1], label='ASOS', lw=2.2)
     ax[1].set_title('Tomorrow')
     ax[1].set_xlabel('Timestamp')
     ax[1].set_ylabel('Radiation')
@@ -175,70 +160,67 @@ def radiation_line(today, tomorrow, output_dir, start_date=None, end_date=None):
             a.spines[s].set_visible(False)
         a.set_xlabel('')
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'radiation_line.png'))
+    return fig
 
-def temp_line(today, tomorrow, output_dir, start_date=None, end_date=None):
+def draw_figure(name, today, tomorrow, output_dir):
+    kind, obs_col, pred_col, margin = FIGURES[name]
+    if kind == 'scatter':
+        fig = scatter_figure(today, tomorrow, obs_col, pred_col, margin)
+    else:
+        fig = line_figure(today, tomorrow, obs_col, pred_col)
+    save_figure(fig, output_dir, name)
+
+def render_figures(today, tomorrow, output_dir, start_date=None, end_date=None, figures=None):
     set_korean_font()
+    os.makedirs(output_dir, exist_ok=True)
 
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
+    today = prepare_data(today, start_date, end_date)
+    tomorrow = prepare_data(tomorrow, start_date, end_date)
 
-    fig, ax = plt.subplots(2, 1, figsize=(14, 14))
+    for name in figures or FIGURES:
+        draw_figure(name, today, tomorrow, output_dir)
 
-    sns.lineplot(data=today, x='timestamp', y='예측온도', ax=ax[0], label='predict', lw=2.2)
-    sns.lineplot(data=today, x='timestamp', y='온도', ax=ax[0], label='ASOS', lw=2.2)
-    ax[0].set_title('Today')
-    ax[0].set_xlabel('Timestamp')
-    ax[0].set_ylabel('Radiation')
-    ax[0].legend(loc='upper left')
+def load_merged(data):
+    if isinstance(data, str):
+        return pd.read_csv(data)
+    return data
 
-    sns.lineplot(data=tomorrow, x='timestamp', y='예측온도', ax=ax[1], label='predict', lw=2.2)
-    sns.lineplot(data=tomorrow, x='timestamp', y='온도', ax=ax[1], label='ASOS', lw=2.2)
-    ax[1].set_title('Tomorrow')
-    ax[1].set_xlabel('Timestamp')
-    ax[1].set_ylabel('Radiation')
-    ax[1].get_legend().remove()
+def render_job(job):
+    today, tomorrow, output_dir, start_date, end_date = job
+    render_figures(load_merged(today), load_merged(tomorrow), output_dir, start_date, end_date)
+    return output_dir
 
-    for a in ax:
-        a.grid(axis="y", which='major', linestyle='--', linewidth=0.5)
-        for s in ["left", "right", "top"]:
-            a.spines[s].set_visible(False)
-        a.set_xlabel('')
+def init_render_worker():
+    plt.switch_backend('Agg')
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'temp_line.png'))
+def render_many(jobs, max_workers=None):
+    # jobs: (merged_today, merged_tomorrow, output_dir, start_date, end_date) 목록
+    # merged 데이터는 DataFrame 또는 csv 경로 모두 가능
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_render_worker) as executor:
+        futures = {executor.submit(render_job, job): job[2] for job in jobs}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Rendering figures"):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error rendering figures for {futures[future]}: {e}")
 
-def wind_line(today, tomorrow, output_dir, start_date=None, end_date=None):
-    set_korean_font()
-
-    today = filter_by_date_range(today, start_date, end_date)
-    tomorrow = filter_by_date_range(tomorrow, start_date, end_date)
+def radiation_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['radiation_scatter'])
 
-    fig, ax = plt.subplots(2, 1, figsize=(14, 14))
+def temp_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['temp_scatter'])
 
-    sns.lineplot(data=today, x='timestamp', y='예측풍속', ax=ax[0], label='predict', lw=2.2)
-    sns.lineplot(data=today, x='timestamp', y='풍속', ax=ax[0], label='ASOS', lw=2.2)
-    ax[0].set_title('Today')
-    ax[0].set_xlabel('Timestamp')
-    ax[0].set_ylabel('Radiation')
-    ax[0].legend(loc='upper left')
+def wind_scatter(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['wind_scatter'])
 
-    sns.lineplot(data=tomorrow, x='timestamp', y='예측풍속', ax=ax[1], label='predict', lw=2.2)
-    sns.lineplot(data=tomorrow, x='timestamp', y='풍속', ax=ax[1], label='ASOS', lw=2.2)
-    ax[1].set_title('Tomorrow')
-    ax[1].set_xlabel('Timestamp')
-    ax[1].set_ylabel('Radiation')
-    ax[1].get_legend().remove()
+def radiation_line(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['radiation_line'])
 
-    for a in ax:
-        a.grid(axis="y", which='major', linestyle='--', linewidth=0.5)
-        for s in ["left", "right", "top"]:
-            a.spines[s].set_visible(False)
-        a.set_xlabel('')
+def temp_line(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['temp_line'])
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'wind_line.png'))
+def wind_line(today, tomorrow, output_dir, start_date=None, end_date=None):
+    render_figures(today, tomorrow, output_dir, start_date, end_date, ['wind_line'])
 
 def main():
     merged_today = pd.read_csv('output/merged_today.csv')
@@ -250,13 +232,8 @@ def main():
     start_date = '2024-07-11'
     end_date = '2024-07-16'
 
-    radiation_scatter(merged_today, merged_tomorrow, output_dir, start_date, end_date)
-    temp_scatter(merged_today, merged_tomorrow, output_dir, start_date, end_date)
-    radiation_line(merged_today, merged_tomorrow, output_dir, start_date, end_date)
-    temp_line(merged_today, merged_tomorrow, output_dir, start_date, end_date)
-    wind_scatter(merged_today, merged_tomorrow, output_dir, start_date, end_date)
-    wind_line(merged_today, merged_tomorrow, output_dir, start_date, end_date)
+    render_figures(merged_today, merged_tomorrow, output_dir, start_date, end_date)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
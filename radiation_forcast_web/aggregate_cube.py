@@ -0,0 +1,144 @@
+import os
+import sys
+import pandas as pd
+from cache_write import partition_lock, write_parquet
+import cache_index
+
+CUBE_DIR = 'output/cache/cube'
+LEVELS = ['daily', 'monthly']
+
+# 자료 종류 -> (날짜 컬럼, 시간 컬럼, 집계 변수)
+# 일사는 MJ/m2(시간 합), 예측광량은 W/m2(시간 평균)이므로 일 합계 단위가 다름
+KINDS = {
+    'asos': ('날짜', '시간', ['일사(MJ/m2)', '온도', '풍속']),
+    'today': ('fcstDate', 'fcstTime', ['예측광량', '예측온도', '예측풍속']),
+    'tomorrow': ('fcstDate', 'fcstTime', ['예측광량', '예측온도', '예측풍속']),
+}
+
+
+def sibling_cube_dir(source_dir):
+    # output/cache/ASOS, output/cache/maru -> output/cache/cube
+    return os.path.join(os.path.dirname(os.path.normpath(source_dir)), 'cube')
+
+
+def cube_path(kind, code, level, cube_dir=CUBE_DIR):
+    # <cube_dir>/<daily|monthly>/<asos|today|tomorrow>/<지점 또는 지역>.parquet
+    return os.path.join(cube_dir, level, kind, f'{code}.parquet')
+
+
+def numeric_values(df, col):
+    # 품질 플래그가 있으면 정상 값만 사용
+    values = pd.to_numeric(df[col], errors='coerce')
+    if f'{col}_qc' in df.columns:
+        values = values.where(df[f'{col}_qc'] == 0)
+    return values
+
+
+def daily_stats(df, kind):
+    # 시간 자료 -> 일별 합계/개수/최소/최대 (같은 시각이 여러 번 있으면 마지막 행만 사용)
+    date_col, time_col, variables = KINDS[kind]
+    dates = df[date_col].astype(str).str[:10]
+    df = df.assign(date=dates).drop_duplicates(subset=['date', time_col], keep='last')
+
+    columns = {'date': df['date'], 'hours': 1}
+    for col in variables:
+        if col in df.columns:
+            columns[col] = numeric_values(df, col)
+    grouped = pd.DataFrame(columns).groupby('date')
+
+    daily = grouped['hours'].sum().to_frame()
+    for col in variables:
+        if col in columns:
+            stats = grouped[col].agg(['sum', 'count', 'min', 'max'])
+            daily = daily.join(stats.add_prefix(f'{col}_'))
+    return daily.reset_index()
+
+
+def roll_up(daily):
+    # 일별 -> 월별 (합계와 개수는 더하고, 최소/최대는 다시 계산)
+    months = daily['date'].str[:7]
+    grouped = daily.drop(columns=['date']).groupby(months)
+    aggregations = {col: ('min' if col.endswith('_min') else 'max' if col.endswith('_max') else 'sum')
+                    for col in daily.columns if col != 'date'}
+    monthly = grouped.agg(aggregations)
+    monthly.insert(0, 'days', grouped.size())
+    return monthly.rename_axis('month').reset_index()
+
+
+def replace_rows(path, key_col, new_rows, keys):
+    # 잠금 안에서 같은 날짜/월의 행만 교체
+    with partition_lock(path):
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            new_rows = pd.concat([existing[~existing[key_col].isin(keys)], new_rows], ignore_index=True)
+        new_rows = new_rows.sort_values(key_col).reset_index(drop=True)
+        write_parquet(new_rows, path)
+    return new_rows
+
+
+def update_month(kind, code, df, cube_dir=CUBE_DIR):
+    # 월 파티션 전체(저장 직후 내용)를 받아 해당 달의 일별/월별 행을 다시 계산
+    if df is None or df.empty:
+        return
+    daily = daily_stats(df, kind)
+    months = daily['date'].str[:7].unique()
+
+    daily_path = cube_path(kind, code, 'daily', cube_dir)
+    os.makedirs(os.path.dirname(daily_path), exist_ok=True)
+    month_days = replace_rows(daily_path, 'date', daily, set(daily['date']))
+    month_days = month_days[month_days['date'].str[:7].isin(months)]
+
+    monthly_path = cube_path(kind, code, 'monthly', cube_dir)
+    os.makedirs(os.path.dirname(monthly_path), exist_ok=True)
+    replace_rows(monthly_path, 'month', roll_up(month_days), set(months))
+
+
+def with_means(df):
+    for col in [col[:-len('_sum')] for col in df.columns if col.endswith('_sum')]:
+        df[f'{col}_mean'] = df[f'{col}_sum'] / df[f'{col}_count'].where(df[f'{col}_count'] > 0)
+    return df
+
+
+def query(kind, code, level='daily', start_date=None, end_date=None, cube_dir=CUBE_DIR):
+    if kind not in KINDS or level not in LEVELS:
+        raise ValueError(f'kind must be one of {list(KINDS)}, level one of {LEVELS}')
+    path = cube_path(kind, code, level, cube_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+
+    df = pd.read_parquet(path)
+    key_col, width = ('date', 10) if level == 'daily' else ('month', 7)
+    if start_date:
+        df = df[df[key_col] >= pd.Timestamp(start_date).strftime('%Y-%m-%d')[:width]]
+    if end_date:
+        df = df[df[key_col] <= pd.Timestamp(end_date).strftime('%Y-%m-%d')[:width]]
+    return with_means(df.reset_index(drop=True))
+
+
+def rebuild(cache_dir='output/cache', cube_dir=None):
+    # 기존 월별 캐시 전체로 집계 큐브를 다시 만듦 (처음 한 번 또는 집계 방식 변경 시)
+    cube_dir = cube_dir or os.path.join(cache_dir, 'cube')
+    count = 0
+    for folder in (os.path.join(cache_dir, 'ASOS'), os.path.join(cache_dir, 'maru')):
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            parsed = cache_index.parse_filename(filename)
+            if parsed is None:
+                continue
+            source, _, code = parsed
+            kind = 'asos' if source == 'ASOS' else source
+            update_month(kind, code, pd.read_csv(os.path.join(folder, filename)), cube_dir)
+            count += 1
+    print(f"Aggregated {count} month partitions into {cube_dir}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild()
+        return
+    print(query('asos', '146', 'monthly'))
+
+
+if __name__ == "__main__":
+    main()
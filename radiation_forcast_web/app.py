@@ -2,33 +2,34 @@ import streamlit as st
 import os
 import pandas as pd
 from datetime import datetime
-import asos_download
-import solar_panel_radiation_download
+import download_jobs
+import export
 from visualization import visualize_data
 
 
-def filter_and_save(df, reg_cd, date_col, cache_dir, prefix, process_asos=True):
-    if df is None or df.empty:
-        # st.warning(f"{prefix} 데이터가 비어 있습니다.")
-        return
-    df[date_col] = pd.to_datetime(df[date_col])
-    df['year_month'] = df[date_col].dt.strftime('%Y_%m')
-    for year_month, group in df.groupby('year_month'):
-        filename = f"{prefix}_{year_month}_{reg_cd}.csv"
-        print(group)
-        if process_asos:
-            group = asos_download.process_asos_data(group)
-        group.to_csv(os.path.join(cache_dir, filename), index=False, encoding='utf-8-sig')
-
-
 def file_exists_for_month(directory, prefix, reg_cd, year_month):
     filename = f"{prefix}_{year_month}_{reg_cd}.csv"
     return os.path.exists(os.path.join(directory, filename))
 
 
-def get_last_date_from_file(filepath, date_col):
-    df = pd.read_csv(filepath, parse_dates=[date_col])
-    return df[date_col].max()
+@st.cache_resource
+def get_download_manager():
+    # 모든 세션이 같은 실행기를 사용하여 동일한 요청은 한 번만 수집
+    return download_jobs.DownloadManager()
+
+
+@st.experimental_fragment(run_every=1)
+def show_download_progress(key):
+    job = get_download_manager().get(key)
+    if job is None:
+        return
+    if job.running():
+        st.progress(job.fraction(), text=f"{job.message} ({job.done}/{job.total}일)")
+        for warning in job.warnings:
+            st.warning(warning)
+    else:
+        # 작업이 끝나면 전체 화면을 다시 그려 결과를 표시
+        st.rerun()
 
 
 def main():
@@ -55,34 +56,24 @@ def main():
         os.makedirs(maru_cache_dir, exist_ok=True)
         os.makedirs(output_dir, exist_ok=True)
 
+        manager = get_download_manager()
         if st.button("자료 다운로드"):
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
-            asos_df = None
-            today_df = None
-            tomorrow_df = None
-
-            # ASOS 데이터 다운로드
-            asos_file = os.path.join(cache_dir, f'ASOS_{start_date.strftime("%Y_%m")}_{stn_ids}.csv')
-            if not os.path.exists(asos_file) or get_last_date_from_file(asos_file, 'tm') < pd.to_datetime(end_date_str):
-                asos_df = asos_download.fetch_weather_data(start_date_str, end_date_str, stn_ids, service_key)
-                date_col = 'tm'
-                filter_and_save(asos_df, stn_ids, date_col, cache_dir, 'ASOS')
-
-            base_dates = pd.date_range(start=start_date, end=end_date).strftime('%Y%m%d')
-
-            # 날씨마루 데이터 다운로드
+            # 백그라운드에서 수집하고, 같은 지점/구간을 요청 중인 작업이 있으면 그 작업을 이어서 표시
+            job = manager.submit(start_date, end_date, stn_ids, reg_cd, service_key, cache_dir, maru_cache_dir)
+            st.session_state['download_key'] = job.key
+
+        job = manager.get(st.session_state.get('download_key'))
+        if job is not None and job.running():
+            show_download_progress(job.key)
+        elif job is not None and job.status == 'failed':
+            st.error(f"다운로드 실패: {job.error}")
+        elif job is not None:
+            for warning in job.warnings:
+                st.warning(warning)
+            today_df, tomorrow_df = job.result
             today_file = os.path.join(maru_cache_dir, f'today_{start_date.strftime("%Y_%m")}_{reg_cd}.csv')
             tomorrow_file = os.path.join(maru_cache_dir, f'tomorrow_{start_date.strftime("%Y_%m")}_{reg_cd}.csv')
 
-            if (not os.path.exists(today_file) or get_last_date_from_file(today_file, 'fcstDate') < pd.to_datetime(
-                    end_date_str)) or (not os.path.exists(tomorrow_file) or get_last_date_from_file(tomorrow_file,
-                                                                                                    'fcstDate') < pd.to_datetime(
-                    end_date_str)):
-                today_df, tomorrow_df = solar_panel_radiation_download.process_weather_data(base_dates, reg_cd)
-                filter_and_save(today_df, reg_cd, 'fcstDate', maru_cache_dir, 'today', process_asos=False)
-                filter_and_save(tomorrow_df, reg_cd, 'fcstDate', maru_cache_dir, 'tomorrow', process_asos=False)
-
             st.write("Today 예측 자료")
             if today_df is not None:
                 st.write(today_df)
@@ -103,22 +94,20 @@ def main():
                     st.write("가장 최근의 Tomorrow 데이터")
                     st.write(last_tomorrow_df)
 
-            # 파일 다운로드 버튼
-            if today_df is not None:
-                for year_month in today_df['year_month'].unique():
-                    filename = f'today_{year_month}_{reg_cd}.csv'
-                    st.download_button(label=f"Download Today's Forecast Data ({year_month})",
-                                       data=today_df[today_df['year_month'] == year_month].to_csv(index=False,
-                                                                                                  encoding='utf-8-sig'),
-                                       file_name=filename)
-
-            if tomorrow_df is not None:
-                for year_month in tomorrow_df['year_month'].unique():
-                    filename = f'tomorrow_{year_month}_{reg_cd}.csv'
-                    st.download_button(label=f"Download Tomorrow's Forecast Data ({year_month})",
-                                       data=tomorrow_df[tomorrow_df['year_month'] == year_month].to_csv(index=False,
-                                                                                                        encoding='utf-8-sig'),
-                                       file_name=filename)
+        # 선택한 구간을 캐시에서 월별 파일로 묶어 하나의 압축 파일로 내려받음
+        st.subheader("일괄 내보내기")
+        export_format = st.radio("파일 형식", ["CSV", "Parquet"], horizontal=True)
+        if st.button("압축 파일 만들기"):
+            st.session_state['export_path'] = export.build_archive(start_date, end_date, stn_ids, reg_cd,
+                                                                   export_format.lower())
+            if st.session_state['export_path'] is None:
+                st.warning("선택한 구간의 캐시 자료가 없습니다.")
+
+        export_path = st.session_state.get('export_path')
+        if export_path and os.path.exists(export_path):
+            with open(export_path, 'rb') as f:
+                st.download_button(label=f"Download {os.path.basename(export_path)}", data=f,
+                                   file_name=os.path.basename(export_path), mime='application/zip')
 
     with tabs[1]:
         visualize_data(start_date, end_date, stn_ids, reg_cd)
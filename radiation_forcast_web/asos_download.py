@@ -1,10 +1,10 @@
-import streamlit as st
 import requests
 import pandas as pd
 import os
 import ssl
 from requests.adapters import HTTPAdapter
 from datetime import datetime
+import http_cache
 
 class SSLAdapter(HTTPAdapter):
     def init_poolmanager(self, *args, **kwargs):
@@ -39,14 +39,15 @@ def fetch_weather_data(start_date, end_date, stn_ids, service_key):
     total_pages = 1
 
     while params['pageNo'] <= total_pages:
-        response = session.get(url, params=params)
+        response = http_cache.cached_get(url, params, http_cache.asos_body_valid, session)
 
         if response.status_code == 200:
             data = response.json()
 
+            # 작업 스레드에서는 st.write가 표시되지 않으므로 오류를 호출한 쪽으로 전달
             if 'body' not in data['response'] or 'items' not in data['response']['body']:
-                st.write("...")
-                return None
+                header = data['response'].get('header', {})
+                raise RuntimeError(f"ASOS {stn_ids} 응답 오류: {header.get('resultMsg', '자료 없음')}")
 
             items = data['response']['body']['items']['item']
             df = pd.json_normalize(items)
@@ -58,8 +59,7 @@ def fetch_weather_data(start_date, end_date, stn_ids, service_key):
 
             params['pageNo'] += 1
         else:
-            st.write(f"Error: {response.status_code}")
-            break
+            raise RuntimeError(f"ASOS {stn_ids} 요청 실패: HTTP {response.status_code}")
 
     if all_data:
         final_df = pd.concat(all_data, ignore_index=True)
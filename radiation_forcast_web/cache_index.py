@@ -0,0 +1,195 @@
+import os
+import io
+import re
+import json
+from bisect import bisect_left, bisect_right
+import pandas as pd
+from cache_write import partition_lock, temp_path
+
+INDEX_FILENAME = '_index.json'
+FILENAME_PATTERN = re.compile(r'^(ASOS|today|tomorrow)_(\d{4}_\d{2})_(\w+)\.csv$')
+
+
+def parse_filename(filename):
+    # 'ASOS_2024_07_146.csv' -> ('ASOS', '2024_07', '146')
+    match = FILENAME_PATTERN.match(filename)
+    if match is None:
+        return None
+    return match.group(1), match.group(2), match.group(3)
+
+
+def partition_key(source, code):
+    return f"{source}|{code}"
+
+
+def row_timestamps(df, source):
+    if source == 'ASOS':
+        return pd.to_datetime(df['tm'])
+    return pd.to_datetime(df['fcstDate'].astype(str).str[:10] + ' ' + df['fcstTime'].astype(str))
+
+
+def segment_changed(segment, stat):
+    return segment is None or segment['size'] != stat.st_size or segment['mtime'] != stat.st_mtime_ns
+
+
+def build_segment(folder_path, filename, source):
+    # 파일 내 일자별 시작 바이트 위치를 기록하여 필요한 구간만 읽을 수 있도록 함
+    # 크기와 수정 시각은 읽은 내용과 같은 파일 핸들에서 구함 (읽는 도중 교체되어도 어긋나지 않음)
+    filepath = os.path.join(folder_path, filename)
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+        mtime = os.fstat(f.fileno()).st_mtime_ns
+
+    header_end = raw.index(b'\n') + 1
+    line_offsets = []
+    pos = header_end
+    while pos < len(raw):
+        line_offsets.append(pos)
+        nxt = raw.find(b'\n', pos)
+        pos = len(raw) if nxt == -1 else nxt + 1
+
+    df = pd.read_csv(io.BytesIO(raw), encoding='utf-8-sig')
+    timestamps = row_timestamps(df, source)
+    days = timestamps.dt.strftime('%Y-%m-%d').tolist()
+
+    segment = {
+        'size': len(raw),
+        'mtime': mtime,
+        'header': header_end,
+        'sorted': bool(timestamps.is_monotonic_increasing) and len(line_offsets) == len(df),
+        'days': [],
+        'offsets': [],
+    }
+    if segment['sorted']:
+        for day, offset in zip(days, line_offsets):
+            if not segment['days'] or segment['days'][-1] != day:
+                segment['days'].append(day)
+                segment['offsets'].append(offset)
+    return segment
+
+
+def read_index(folder_path):
+    index_path = os.path.join(folder_path, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        with open(index_path, encoding='utf-8') as f:
+            return json.load(f)
+    return rebuild_index(folder_path)
+
+
+def unindexed_files(folder_path, index):
+    if not os.path.exists(folder_path):
+        return []
+    return sorted(filename for filename in os.listdir(folder_path)
+                  if parse_filename(filename) is not None and filename not in index['segments'])
+
+
+def load_index(folder_path):
+    # register_file을 거치지 않고 저장된 파티션(복사한 캐시 등)이 있으면 색인에 추가
+    index = read_index(folder_path)
+    unindexed = unindexed_files(folder_path, index)
+    if unindexed:
+        index = register_files(folder_path, unindexed)
+    return index
+
+
+def save_index(folder_path, index):
+    index_path = os.path.join(folder_path, INDEX_FILENAME)
+    tmp = temp_path(index_path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path)
+
+
+def add_to_index(index, folder_path, filename):
+    parsed = parse_filename(filename)
+    if parsed is None:
+        return index
+    source, year_month, code = parsed
+
+    partitions = index['partitions'].setdefault(partition_key(source, code), [])
+    months = [p[0] for p in partitions]
+    pos = bisect_left(months, year_month)
+    if pos < len(months) and months[pos] == year_month:
+        partitions[pos] = [year_month, filename]
+    else:
+        partitions.insert(pos, [year_month, filename])
+
+    index['segments'][filename] = build_segment(folder_path, filename, source)
+    return index
+
+
+def rebuild_index(folder_path):
+    # 색인 파일이 없을 때 디렉토리 전체로 새로 만듦
+    index = {'partitions': {}, 'segments': {}}
+    if os.path.exists(folder_path):
+        for filename in sorted(os.listdir(folder_path)):
+            add_to_index(index, folder_path, filename)
+        save_index(folder_path, index)
+    return index
+
+
+def register_files(folder_path, filenames):
+    # 여러 작업이 동시에 색인을 갱신해도 서로의 항목을 덮어쓰지 않도록 잠금
+    with partition_lock(os.path.join(folder_path, INDEX_FILENAME)):
+        index = read_index(folder_path)
+        for filename in filenames:
+            add_to_index(index, folder_path, filename)
+        save_index(folder_path, index)
+    return index
+
+
+def register_file(folder_path, filename):
+    return register_files(folder_path, [filename])
+
+
+def query_partitions(index, source, code, start_date, end_date):
+    partitions = index['partitions'].get(partition_key(source, str(code)), [])
+    months = [p[0] for p in partitions]
+    lo = bisect_left(months, pd.Timestamp(start_date).strftime('%Y_%m'))
+    hi = bisect_right(months, pd.Timestamp(end_date).strftime('%Y_%m'))
+    return [p[1] for p in partitions[lo:hi]]
+
+
+def read_segment(folder_path, filename, segment, source, start, end):
+    # 구간 정보는 지금 연 파일과 크기/수정 시각이 같을 때만 사용하고, 다르면 같은 핸들에서 전체를 읽음
+    filepath = os.path.join(folder_path, filename)
+    with open(filepath, 'rb') as f:
+        if segment_changed(segment, os.fstat(f.fileno())) or not segment['sorted']:
+            df = pd.read_csv(io.BytesIO(f.read()), encoding='utf-8-sig')
+        else:
+            days = segment['days']
+            lo = bisect_left(days, start.strftime('%Y-%m-%d'))
+            hi = bisect_right(days, end.strftime('%Y-%m-%d'))
+            if lo >= hi:
+                return pd.DataFrame()
+
+            begin = segment['offsets'][lo]
+            finish = segment['offsets'][hi] if hi < len(days) else segment['size']
+            header = f.read(segment['header'])
+            f.seek(begin)
+            chunk = f.read(finish - begin)
+            df = pd.read_csv(io.BytesIO(header + chunk), encoding='utf-8-sig')
+
+    timestamps = row_timestamps(df, source)
+    return df[(timestamps >= start) & (timestamps <= end)]
+
+
+def read_range(folder_path, source, code, start_date, end_date, index=None):
+    if index is None:
+        index = load_index(folder_path)
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+
+    dfs = []
+    for filename in query_partitions(index, source, code, start, end):
+        segment = index['segments'].get(filename)
+        if segment_changed(segment, os.stat(os.path.join(folder_path, filename))):
+            # 색인 이후 다시 쓰인 파일은 구간 정보를 새로 만들어 저장
+            index = register_file(folder_path, filename)
+            segment = index['segments'][filename]
+        df = read_segment(folder_path, filename, segment, source, start, end)
+        if not df.empty:
+            dfs.append(df)
+    if dfs:
+        return pd.concat(dfs, ignore_index=True)
+    return pd.DataFrame()
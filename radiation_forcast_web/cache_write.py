@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import Event, Process
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = '.lock'
+
+
+@contextmanager
+def partition_lock(path):
+    # 파티션 파일 옆의 '<파일>.lock'에 배타적 잠금 (프로세스/스레드 모두 대기)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + LOCK_SUFFIX, 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def temp_path(path):
+    # 작성자마다 다른 임시 파일을 사용하여 서로의 임시 파일을 덮어쓰지 않도록 함
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def commit(tmp, path):
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_csv(df, path):
+    tmp = temp_path(path)
+    df.to_csv(tmp, index=False, encoding='utf-8-sig')
+    commit(tmp, path)
+
+
+def write_parquet(df, path):
+    tmp = temp_path(path)
+    df.to_parquet(tmp, index=False)
+    commit(tmp, path)
+
+
+def update_csv(path, df, merge, on_commit=None, **read_kwargs):
+    # 잠금 안에서 기존 파일을 읽어 병합 후 교체. 반환값은 실제로 기록된 내용 (잠금 해제 후 다른 프로세스도 같은 내용을 읽음)
+    # on_commit(기록된 내용)은 잠금 안에서 호출되므로 파생 자료(집계 등)도 파일과 같은 순서로 갱신됨
+    # 실수는 쓴 값 그대로 읽어 다시 써도 기존 행이 바뀌지 않도록 함
+    with partition_lock(path):
+        existing = pd.read_csv(path, float_precision='round_trip', **read_kwargs) if os.path.exists(path) else None
+        merged = merge(existing, df)
+        write_csv(merged, path)
+        if on_commit is not None:
+            on_commit(merged)
+    return merged
+
+
+def append_rows(existing, df, keys, sort_by):
+    # 기존 행 + 새 행, 같은 키는 새 행 우선
+    if existing is not None:
+        df = pd.concat([existing, df], ignore_index=True)
+    return df.drop_duplicates(subset=keys, keep='last').sort_values(sort_by).reset_index(drop=True)
+
+
+def stress_writer(path, writer_id, batches, rows):
+    # 작성자별로 겹치지 않는 시각을 여러 번 나누어 추가
+    for batch in range(batches):
+        start = pd.Timestamp('2024-01-01') + pd.Timedelta(hours=(writer_id * batches + batch) * rows)
+        tm = pd.date_range(start, periods=rows, freq='h')
+        df = pd.DataFrame({'tm': tm.strftime('%Y-%m-%d %H:%M'), 'writer': writer_id, 'batch': batch})
+        update_csv(path, df, lambda existing, new: append_rows(existing, new, ['tm'], 'tm'))
+
+
+def stress_reader(path, done):
+    # 쓰는 도중에도 항상 완전한 파일을 읽어야 하고, 행 수는 줄어들지 않아야 함
+    last = 0
+    while not done.is_set():
+        if os.path.exists(path):
+            rows = len(pd.read_csv(path))
+            if rows < last:
+                sys.exit(f'rows went backwards: {last} -> {rows}')
+            last = rows
+        time.sleep(0.01)
+
+
+def stress_test(writers=8, batches=10, rows=24, readers=2):
+    root = tempfile.mkdtemp()
+    path = os.path.join(root, 'stress.csv')
+    try:
+        writer_procs = [Process(target=stress_writer, args=(path, i, batches, rows)) for i in range(writers)]
+        done = Event()
+        reader_procs = [Process(target=stress_reader, args=(path, done)) for _ in range(readers)]
+        for proc in writer_procs + reader_procs:
+            proc.start()
+        for proc in writer_procs:
+            proc.join()
+        done.set()
+        for proc in reader_procs:
+            proc.join()
+
+        df = pd.read_csv(path)
+        expected = writers * batches * rows
+        problems = []
+        if len(df) != expected:
+            problems.append(f'expected {expected} rows, found {len(df)}')
+        if df['tm'].duplicated().any():
+            problems.append('duplicate rows')
+        if not df['tm'].is_monotonic_increasing:
+            problems.append('rows not sorted')
+        counts = df.groupby(['writer', 'batch']).size()
+        if len(counts) != writers * batches or (counts != rows).any():
+            problems.append('missing writer batches')
+        if any(proc.exitcode != 0 for proc in writer_procs + reader_procs):
+            problems.append('a writer failed or a reader saw a torn or shrinking file')
+        if [f for f in os.listdir(root) if f.endswith('.tmp')]:
+            problems.append('leftover temp files')
+
+        print(f"{writers} writers x {batches} batches x {rows} rows: {len(df)} rows written, "
+              f"{'OK' if not problems else '; '.join(problems)}")
+        return not problems
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    sys.exit(0 if stress_test() else 1)
+
+
+if __name__ == "__main__":
+    main()
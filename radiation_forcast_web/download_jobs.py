@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import asos_download
+import solar_panel_radiation_download
+import cache_index
+import aggregate_cube
+from cache_write import update_csv, append_rows
+
+MAX_WORKERS = 4
+JOB_TTL = 3600  # 끝난 작업을 보관하는 시간(초)
+
+
+def filter_and_save(df, reg_cd, date_col, cache_dir, prefix, process_asos=True):
+    if df is None or df.empty:
+        return
+    df[date_col] = pd.to_datetime(df[date_col])
+    df['year_month'] = df[date_col].dt.strftime('%Y_%m')
+    kind = 'asos' if process_asos else prefix
+    cube_dir = aggregate_cube.sibling_cube_dir(cache_dir)
+    for year_month, group in df.groupby('year_month'):
+        filename = f"{prefix}_{year_month}_{reg_cd}.csv"
+        if process_asos:
+            group = asos_download.process_asos_data(group)
+        # 다른 작업/프로세스가 같은 달을 저장해도 행이 사라지지 않도록 파일 잠금 후 병합
+        # (시간순으로 저장해야 색인에서 일자별 구간을 찾을 수 있음)
+        keys = [date_col] if process_asos else [date_col, 'fcstTime']
+        # 저장된 달의 일별/월별 집계도 같은 잠금 안에서 갱신
+        update_csv(os.path.join(cache_dir, filename), group,
+                   lambda existing, new: append_rows(existing, new, keys, keys),
+                   on_commit=lambda merged: aggregate_cube.update_month(kind, reg_cd, merged, cube_dir),
+                   parse_dates=[date_col])
+        cache_index.register_file(cache_dir, filename)
+
+
+def get_last_date_from_file(filepath, date_col):
+    df = pd.read_csv(filepath, parse_dates=[date_col])
+    return df[date_col].max()
+
+
+def needs_update(filepath, date_col, end_date):
+    return not os.path.exists(filepath) or get_last_date_from_file(filepath, date_col) < pd.to_datetime(end_date)
+
+
+class DownloadJob:
+    def __init__(self, key):
+        self.key = key
+        self.status = 'pending'
+        self.message = '대기 중'
+        self.total = 0
+        self.done = 0
+        self.error = None
+        self.warnings = []  # 실패한 날짜별 오류 (나머지 날짜는 계속 수집)
+        self.result = (None, None)
+        self.finished_at = None
+
+    def advance(self, base_date):
+        self.done += 1
+        self.message = f"날씨마루 {base_date} 수집"
+
+    def fail_day(self, base_date, error):
+        self.warnings.append(f"날씨마루 {base_date}: {error}")
+
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def running(self):
+        return self.status in ('pending', 'running')
+
+
+def run_download(job, start_date, end_date, stn_ids, reg_cd, service_key, cache_dir, maru_cache_dir):
+    job.status = 'running'
+    start_date_str = start_date.strftime('%Y-%m-%d')
+    end_date_str = end_date.strftime('%Y-%m-%d')
+    base_dates = pd.date_range(start=start_date, end=end_date).strftime('%Y%m%d')
+    job.total = len(base_dates)
+
+    try:
+        # ASOS 데이터 다운로드
+        asos_file = os.path.join(cache_dir, f'ASOS_{start_date.strftime("%Y_%m")}_{stn_ids}.csv')
+        if needs_update(asos_file, 'tm', end_date_str):
+            job.message = 'ASOS 수집'
+            asos_df = asos_download.fetch_weather_data(start_date_str, end_date_str, stn_ids, service_key)
+            filter_and_save(asos_df, stn_ids, 'tm', cache_dir, 'ASOS')
+
+        # 날씨마루 데이터 다운로드
+        today_file = os.path.join(maru_cache_dir, f'today_{start_date.strftime("%Y_%m")}_{reg_cd}.csv')
+        tomorrow_file = os.path.join(maru_cache_dir, f'tomorrow_{start_date.strftime("%Y_%m")}_{reg_cd}.csv')
+        if needs_update(today_file, 'fcstDate', end_date_str) or needs_update(tomorrow_file, 'fcstDate', end_date_str):
+            today_df, tomorrow_df = solar_panel_radiation_download.process_weather_data(base_dates, reg_cd,
+                                                                                        progress=job.advance,
+                                                                                        on_error=job.fail_day)
+            filter_and_save(today_df, reg_cd, 'fcstDate', maru_cache_dir, 'today', process_asos=False)
+            filter_and_save(tomorrow_df, reg_cd, 'fcstDate', maru_cache_dir, 'tomorrow', process_asos=False)
+            job.result = (today_df, tomorrow_df)
+        job.done = job.total
+        job.status = 'done'
+        job.message = '완료'
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+
+
+class DownloadManager:
+    # 세션 간에 공유되는 백그라운드 다운로드 실행기 (같은 요청은 하나의 작업으로 합침)
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, start_date, end_date, stn_ids, reg_cd, service_key, cache_dir, maru_cache_dir):
+        key = f"{stn_ids}|{reg_cd}|{start_date:%Y%m%d}|{end_date:%Y%m%d}"
+        with self.lock:
+            self.prune()
+            job = self.jobs.get(key)
+            if job is not None and job.running():
+                return job
+
+            job = DownloadJob(key)
+            self.jobs[key] = job
+            self.executor.submit(run_download, job, start_date, end_date, stn_ids, reg_cd, service_key,
+                                 cache_dir, maru_cache_dir)
+        return job
+
+    def get(self, key):
+        return self.jobs.get(key)
+
+    def prune(self):
+        now = time.time()
+        for key in [key for key, job in self.jobs.items()
+                    if job.finished_at is not None and now - job.finished_at > JOB_TTL]:
+            del self.jobs[key]
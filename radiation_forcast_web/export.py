@@ -0,0 +1,105 @@
+import os
+import io
+import time
+import json
+import hashlib
+import zipfile
+import pandas as pd
+import cache_index
+from cache_write import temp_path, commit
+
+EXPORT_DIR = 'output/export'
+EXPORT_KEEP = 10  # 보관할 최근 압축 파일 수
+EXPORT_MIN_AGE = 3600  # 만들거나 다시 사용한 지 이 시간(초)이 지나지 않은 압축 파일은 지우지 않음 (다른 세션이 내려받는 중일 수 있음)
+
+
+def export_sources(cache_root, stn_ids, reg_cd):
+    # (자료 종류, 캐시 폴더, 코드)
+    return [
+        ('ASOS', os.path.join(cache_root, 'ASOS'), str(stn_ids)),
+        ('today', os.path.join(cache_root, 'maru'), str(reg_cd)),
+        ('tomorrow', os.path.join(cache_root, 'maru'), str(reg_cd)),
+    ]
+
+
+def export_plan(sources, start, end):
+    plan = []
+    for source, folder, code in sources:
+        index = cache_index.load_index(folder)
+        for filename in cache_index.query_partitions(index, source, code, start, end):
+            plan.append((source, folder, filename, index['segments'].get(filename)))
+    return plan
+
+
+def export_key(plan, start, end, fmt):
+    # 같은 구간/형식이고 캐시 파일이 바뀌지 않았으면 이전 압축 파일을 재사용
+    files = {}
+    for _, folder, filename, _ in plan:
+        stat = os.stat(os.path.join(folder, filename))
+        files[filename] = [stat.st_size, stat.st_mtime_ns]
+    key = json.dumps([str(start), str(end), fmt, files], sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def write_entry(zf, name, df, fmt):
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        zf.writestr(f'{name}.parquet', buffer.getvalue())
+    else:
+        with zf.open(f'{name}.csv', 'w') as f, io.TextIOWrapper(f, encoding='utf-8-sig', newline='') as text:
+            df.to_csv(text, index=False)
+
+
+def cleanup_exports(export_dir, keep=EXPORT_KEEP, min_age=EXPORT_MIN_AGE):
+    # 다른 세션이 동시에 정리하여 이미 지워진 파일은 건너뜀
+    archives = []
+    for filename in os.listdir(export_dir):
+        if not filename.endswith('.zip'):
+            continue
+        path = os.path.join(export_dir, filename)
+        try:
+            archives.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue
+    archives.sort(reverse=True)
+
+    cutoff = time.time() - min_age
+    for mtime, path in archives[keep:]:
+        if mtime >= cutoff:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def build_archive(start_date, end_date, stn_ids, reg_cd, fmt='csv', cache_root='output/cache', export_dir=EXPORT_DIR):
+    # 월 파일을 하나씩 읽어 압축 파일에 바로 기록 (메모리에는 한 달치만 유지)
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    plan = export_plan(export_sources(cache_root, stn_ids, reg_cd), start, end)
+    if not plan:
+        return None
+
+    os.makedirs(export_dir, exist_ok=True)
+    filename = f"{stn_ids}_{reg_cd}_{start:%Y%m%d}_{end:%Y%m%d}_{export_key(plan, start, end, fmt)}.zip"
+    path = os.path.join(export_dir, filename)
+    try:
+        # 이전 압축 파일을 재사용하면 수정 시각을 갱신하여 정리 대상에서 제외
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    # 같은 구간을 여러 세션이 동시에 내보내도 서로의 임시 파일에 쓰지 않도록 작성자별 임시 파일 사용
+    tmp = temp_path(path)
+    with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for source, folder, name, segment in plan:
+            df = cache_index.read_segment(folder, name, segment, source, start, end)
+            if not df.empty:
+                write_entry(zf, os.path.splitext(name)[0], df, fmt)
+    commit(tmp, path)
+
+    cleanup_exports(export_dir)
+    return path
@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+import plotly.graph_objects as go
+import cache_index
+
+FIGURE_CACHE_DIR = 'output/cache/figures'
+FIGURE_CACHE_KEEP = 200  # 보관할 최근 그래프 묶음 수
+
+
+def data_version(asos_folder_path, maru_folder_path, stn_ids, reg_cd, start, end):
+    # 구간에 걸친 캐시 파일의 크기/수정 시각 (파일이 새로 저장되면 값이 바뀜)
+    files = {}
+    for source, folder, code in (('ASOS', asos_folder_path, stn_ids), ('today', maru_folder_path, reg_cd),
+                                 ('tomorrow', maru_folder_path, reg_cd)):
+        index = cache_index.load_index(folder)
+        for filename in cache_index.query_partitions(index, source, code, start, end):
+            path = os.path.join(folder, filename)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                files[filename] = [stat.st_size, stat.st_mtime_ns]
+    return hashlib.sha1(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def figure_key(version, stn_ids, reg_cd, start_date, end_date, chart):
+    key = json.dumps([version, str(stn_ids), str(reg_cd), str(start_date), str(end_date), chart], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def figure_path(key, cache_dir=FIGURE_CACHE_DIR):
+    return os.path.join(cache_dir, f'{key}.json')
+
+
+def load_figures(key, cache_dir=FIGURE_CACHE_DIR):
+    path = figure_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            serialized = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 최근 사용 시각 갱신 (오래 쓰지 않은 항목부터 삭제)
+    os.utime(path)
+    # 저장할 때 이미 검증된 그래프이므로 다시 검증하지 않음
+    return [go.Figure(json.loads(fig), _validate=False) for fig in serialized]
+
+
+def store_figures(key, figures, cache_dir=FIGURE_CACHE_DIR, keep=FIGURE_CACHE_KEEP):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = figure_path(key, cache_dir)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump([fig.to_json() for fig in figures], f)
+    os.replace(tmp, path)
+    evict(cache_dir, keep)
+
+
+def evict(cache_dir=FIGURE_CACHE_DIR, keep=FIGURE_CACHE_KEEP):
+    entries = sorted((os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith('.json')),
+                     key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
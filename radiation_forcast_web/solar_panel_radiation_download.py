@@ -1,5 +1,4 @@
-import streamlit as st
-import requests
+import http_cache
 import pandas as pd
 import json
 
@@ -11,7 +10,7 @@ def fetch_forecast_data(base_date, reg_cd):
         'regCd': reg_cd
     }
 
-    response = requests.get(url, params=params)
+    response = http_cache.cached_get(url, params, http_cache.maru_body_valid)
 
     if response.status_code == 200:
         data = response.text
@@ -27,18 +26,29 @@ def fetch_forecast_data(base_date, reg_cd):
         tomorrow = df[df['baseDate'] != df['fcstDate']]
         return today, tomorrow
     else:
-        st.write(f"Failed to retrieve data for baseDate {base_date}: {response.status_code}")
-        return pd.DataFrame(), pd.DataFrame()
+        raise RuntimeError(f"Failed to retrieve data for baseDate {base_date}: {response.status_code}")
 
 
-def process_weather_data(base_dates, reg_cd):
+def process_weather_data(base_dates, reg_cd, progress=None, on_error=None):
     today_df = pd.DataFrame()
     tomorrow_df = pd.DataFrame()
 
     for base_date in base_dates:
-        today, tomorrow = fetch_forecast_data(base_date, reg_cd)
+        try:
+            today, tomorrow = fetch_forecast_data(base_date, reg_cd)
+        except Exception as e:
+            # on_error가 있으면 실패한 날을 알리고 나머지 날짜를 계속 수집
+            if on_error is None:
+                raise
+            on_error(base_date, e)
+            today, tomorrow = pd.DataFrame(), pd.DataFrame()
         today_df = pd.concat([today_df, today], ignore_index=True)
         tomorrow_df = pd.concat([tomorrow_df, tomorrow], ignore_index=True)
+        if progress is not None:
+            progress(base_date)
+
+    if today_df.empty and tomorrow_df.empty:
+        raise RuntimeError(f"날씨마루 {reg_cd}: 수집된 자료가 없습니다")
 
     today_df = today_df[['fcstDate', 'fcstTime', 'srad', 'regCd', 'temp', 'wspd']]
     tomorrow_df = tomorrow_df[['fcstDate', 'fcstTime', 'srad', 'regCd', 'temp', 'wspd']]
@@ -2,9 +2,11 @@ import os
 import pandas as pd
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
-import statsmodels.api as sm
 import streamlit as st
 import numpy as np
+import cache_index
+import figure_cache
+import aggregate_cube
 
 def save_and_update_data(new_df, filename, output_dir):
     filepath = os.path.join(output_dir, filename)
@@ -30,6 +32,8 @@ def filename_parsing(folder_path):
     asos_filenames = []
 
     for filename in os.listdir(folder_path):
+        if not filename.endswith('.csv'):
+            continue
         if 'today' in filename:
             maru_today_filenames.append(filename)
         elif 'tomorrow' in filename:
@@ -50,24 +54,13 @@ def generate_date_range(start_date, end_date):
     return list(set(date_range))  # 중복 제거
 
 def file_pattern(asos_folder_path, maru_folder_path, start_date, end_date, stn_ids, reg_cd):
-    maru_today_filenames, maru_tomorrow_filenames, _ = filename_parsing(maru_folder_path)
-    _, _, asos_filenames = filename_parsing(asos_folder_path)
-    date_range = generate_date_range(start_date, end_date)
-
-    filtered_asos = []
-    filtered_today = []
-    filtered_tomorrow = []
-
-    for date in date_range:
-        for filename in asos_filenames:
-            if date in filename and stn_ids in filename:
-                filtered_asos.append(filename)
-        for filename in maru_today_filenames:
-            if date in filename and reg_cd in filename:
-                filtered_today.append(filename)
-        for filename in maru_tomorrow_filenames:
-            if date in filename and reg_cd in filename:
-                filtered_tomorrow.append(filename)
+    # 색인에서 (원천, 코드)별 월 파티션을 이진 탐색하여 조회
+    asos_index = cache_index.load_index(asos_folder_path)
+    maru_index = cache_index.load_index(maru_folder_path)
+
+    filtered_asos = cache_index.query_partitions(asos_index, 'ASOS', stn_ids, start_date, end_date)
+    filtered_today = cache_index.query_partitions(maru_index, 'today', reg_cd, start_date, end_date)
+    filtered_tomorrow = cache_index.query_partitions(maru_index, 'tomorrow', reg_cd, start_date, end_date)
 
     return filtered_asos, filtered_today, filtered_tomorrow
 
@@ -82,21 +75,79 @@ def concat_files(folder_path, filenames):
     else:
         return pd.DataFrame()
 
-def visualize_data(start_date, end_date, stn_ids, reg_cd):
-    st.header("시각화")
-    start_date = st.date_input("그래프 시작 날짜", value= start_date)
-    end_date = st.date_input("그래프 종료 날짜", value= end_date + timedelta(days=2))
-    stn_ids = st.text_input("기상청 측후소 번호", value=stn_ids)
-    reg_cd = st.text_input("날씨마루 지점 코드", value=reg_cd)
-
-    asos_folder_path = 'output/cache/ASOS'
-    maru_folder_path = 'output/cache/maru'
-
-    asos_files, today_files, tomorrow_files = file_pattern(asos_folder_path, maru_folder_path, start_date, end_date, stn_ids, reg_cd)
+# 산점도 점 수에 따른 표시 방식 (SVG -> WebGL -> 서버에서 계산한 2차원 히스토그램)
+WEBGL_THRESHOLD = 5000
+DENSITY_THRESHOLD = 50000
+DENSITY_BINS = 120
+
+def fit_stats(x, y):
+    # 최소제곱 추세선과 R²/RMSE를 합계 통계로 한 번에 계산 (statsmodels OLS와 같은 정의)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    n = len(x)
+    if n < 3 or np.ptp(x) == 0:
+        return None
+    x_mean, y_mean = x.mean(), y.mean()
+    sxx = ((x - x_mean) ** 2).sum()
+    sxy = ((x - x_mean) * (y - y_mean)).sum()
+    syy = ((y - y_mean) ** 2).sum()
+    slope = sxy / sxx
+    ssr = syy - slope * sxy
+    return {
+        'n': n, 'slope': slope, 'intercept': y_mean - slope * x_mean,
+        'r2': 1 - ssr / syy if syy > 0 else np.nan, 'rmse': np.sqrt(max(ssr, 0) / (n - 2)),
+        'x_min': x.min(), 'x_max': x.max(),
+    }
+
+def density_trace(x, y, bins=DENSITY_BINS):
+    # 점을 보내는 대신 NumPy로 격자별 개수를 계산하여 히트맵으로 표시
+    valid = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=bins)
+    counts = np.where(counts > 0, counts, np.nan)
+    return go.Heatmap(x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2, z=counts.T,
+                      colorscale='Viridis', colorbar=dict(title='개수'), name='Data')
+
+def scatter_figure(x, y, title, xaxis_title, yaxis_title):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    fig = go.Figure()
+    if len(x) > DENSITY_THRESHOLD:
+        fig.add_trace(density_trace(x, y))
+    elif len(x) > WEBGL_THRESHOLD:
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='markers', name='Data', marker=dict(size=4, opacity=0.5)))
+    else:
+        fig.add_trace(go.Scatter(x=x, y=y, mode='markers', name='Data'))
+
+    # 추세선은 양 끝 두 점만 전달
+    stats = fit_stats(x, y)
+    if stats is not None:
+        line_x = np.array([stats['x_min'], stats['x_max']])
+        fig.add_trace(go.Scatter(
+            x=line_x,
+            y=stats['intercept'] + stats['slope'] * line_x,
+            mode='lines',
+            line=dict(color='red'),
+            name=f"Trendline (R²={stats['r2']:.2f}, RMSE={stats['rmse']:.2f})"
+        ))
+
+    # 레이아웃 업데이트 (1:1 비율로 설정)
+    fig.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        xaxis=dict(scaleanchor="y", scaleratio=1),
+        yaxis=dict(scaleanchor="x", scaleratio=1)
+    )
+    return fig
 
-    asos_df = concat_files(asos_folder_path, asos_files)
-    today_df = concat_files(maru_folder_path, today_files)
-    tomorrow_df = concat_files(maru_folder_path, tomorrow_files)
+def load_chart_data(start_date, end_date, stn_ids, reg_cd, asos_folder_path, maru_folder_path):
+    range_start = pd.to_datetime(start_date)
+    range_end = pd.to_datetime(end_date) + timedelta(days=1) - timedelta(seconds=1)
+    asos_df = cache_index.read_range(asos_folder_path, 'ASOS', stn_ids, range_start, range_end)
+    today_df = cache_index.read_range(maru_folder_path, 'today', reg_cd, range_start, range_end)
+    tomorrow_df = cache_index.read_range(maru_folder_path, 'tomorrow', reg_cd, range_start, range_end)
 
 
     # timestamp 컬럼 생성
@@ -118,425 +169,272 @@ def visualize_data(start_date, end_date, stn_ids, reg_cd):
     filtered_tomorrow_df = tomorrow_df[
         (tomorrow_df['timestamp'] >= pd.to_datetime(start_date)) & (tomorrow_df['timestamp'] <= pd.to_datetime(end_date))]
 
+    return filtered_today_df, filtered_tomorrow_df, asos_df
+
+def forecast_line_figures(filtered_today_df, filtered_tomorrow_df, asos_df):
+    figures = []
+    # 예측광량 데이터 프레임 병합
+    combined_radiation_df = pd.concat([
+        filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow')
+    ])
+
+    # 예측광량 그래프
+    fig_rad = go.Figure()
+    fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Today']['timestamp'],
+                                 y=combined_radiation_df[combined_radiation_df['day'] == 'Today']['예측광량'],
+                                 mode='lines',
+                                 name='Today',
+                                 line=dict(color='#FFD700')))
+    fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['timestamp'],
+                                 y=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['예측광량'],
+                                 mode='lines',
+                                 name='Tomorrow',
+                                 line=dict(color='#FFA500', dash='dash')))
+    fig_rad.update_layout(title='예측광량', xaxis_title='Timestamp', yaxis_title='Radiation')
+    figures.append(fig_rad)
+
+    # 예측온도 데이터 프레임 병합
+    combined_temp_df = pd.concat([
+        filtered_today_df[['timestamp', '예측온도']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측온도']].assign(day='Tomorrow')
+    ])
+
+    # 예측온도 그래프
+    fig_temp = go.Figure()
+    fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Today']['timestamp'],
+                                  y=combined_temp_df[combined_temp_df['day'] == 'Today']['예측온도'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#FF6347')))
+    fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['timestamp'],
+                                  y=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['예측온도'],
+                                  mode='lines',
+                                  name='Tomorrow',
+                                  line=dict(color='#FF4500', dash='dash')))
+    fig_temp.update_layout(title='예측온도', xaxis_title='Timestamp', yaxis_title='Temperature')
+    figures.append(fig_temp)
+
+    # 예측풍속 데이터 프레임 병합
+    combined_wind_df = pd.concat([
+        filtered_today_df[['timestamp', '예측풍속']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측풍속']].assign(day='Tomorrow')
+    ])
+
+    # 예측풍속 그래프
+    fig_wind = go.Figure()
+    fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Today']['timestamp'],
+                                  y=combined_wind_df[combined_wind_df['day'] == 'Today']['예측풍속'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#1E90FF')))
+    fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['timestamp'],
+                                  y=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['예측풍속'],
+                                  mode='lines',
+                                  name='Tomorrow',
+                                  line=dict(color='#4169E1', dash='dash')))
+    fig_wind.update_layout(title='예측풍속', xaxis_title='Timestamp', yaxis_title='Wind Speed')
+    figures.append(fig_wind)
+    return figures
+
+def forecast_scatter_figures(filtered_today_df, filtered_tomorrow_df, asos_df):
+    figures = []
+    # 예측 광량/온도/풍속 산점도 (Tomorrow 예측 vs Today 예측)
+    for col in ('예측광량', '예측온도', '예측풍속'):
+        merged = pd.merge(
+            filtered_today_df[['timestamp', col]],
+            filtered_tomorrow_df[['timestamp', col]],
+            how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
+        )
+        figures.append(scatter_figure(merged[f'{col}_Tomorrow'], merged[f'{col}_Today'],
+                                       f'Today 와 Tomorrow {col} 비교',
+                                       f'Tomorrow {col}', f'Today {col}'))
+    return figures
+
+def asos_line_figures(filtered_today_df, filtered_tomorrow_df, asos_df):
+    figures = []
+    # 예측광량 데이터 프레임 병합
+    combined_radiation_df = pd.concat([
+        filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow')
+    ])
+
+    combined_radiation_df['예측광량'] = combined_radiation_df['예측광량'] * 0.0036
+
+    # 예측광량 그래프
+    fig_rad = go.Figure()
+    fig_rad.add_trace(go.Scatter(x=asos_df['tm'],
+                                y=asos_df['일사(MJ/m2)'],
+                                mode='lines',
+                                name='ASOS',
+                                line=dict(color='#FF4000')))
+
+    fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Today']['timestamp'],
+                                 y=combined_radiation_df[combined_radiation_df['day'] == 'Today']['예측광량'],
+                                 mode='lines',
+                                 name='Today',
+                                 line=dict(color='#FFD700')))
+    fig_rad.add_trace(
+        go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['timestamp'],
+                   y=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['예측광량'],
+                   mode='lines',
+                   name='Tomorrow',
+                   line=dict(color='#FFA500', dash='dash')))
+
+    fig_rad.update_layout(title='일사(MJ/m2)', xaxis_title='Timestamp', yaxis_title='Radiation')
+    figures.append(fig_rad)
+
+
+    # 예측온도 데이터 프레임 병합
+    combined_temp_df = pd.concat([
+        filtered_today_df[['timestamp', '예측온도']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측온도']].assign(day='Tomorrow')
+    ])
+
+    # 예측온도 그래프
+    fig_temp = go.Figure()
+    fig_temp.add_trace(go.Scatter(x=asos_df['tm'],
+                                  y=asos_df['온도'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#FFBF00')))
+    fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Today']['timestamp'],
+                                  y=combined_temp_df[combined_temp_df['day'] == 'Today']['예측온도'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#FF6347')))
+    fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['timestamp'],
+                                  y=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['예측온도'],
+                                  mode='lines',
+                                  name='Tomorrow',
+                                  line=dict(color='#FF4500', dash='dash')))
+    fig_temp.update_layout(title='예측온도', xaxis_title='Timestamp', yaxis_title='Temperature')
+    figures.append(fig_temp)
+
+
+    # 예측풍속 데이터 프레임 병합
+    combined_wind_df = pd.concat([
+        filtered_today_df[['timestamp', '예측풍속']].assign(day='Today'),
+        filtered_tomorrow_df[['timestamp', '예측풍속']].assign(day='Tomorrow')
+    ])
+
+    # 예측풍속 그래프
+    fig_wind = go.Figure()
+    fig_wind.add_trace(go.Scatter(x=asos_df['tm'],
+                                  y=asos_df['풍속'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#A4A4A4')))
+    fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Today']['timestamp'],
+                                  y=combined_wind_df[combined_wind_df['day'] == 'Today']['예측풍속'],
+                                  mode='lines',
+                                  name='Today',
+                                  line=dict(color='#1E90FF')))
+    fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['timestamp'],
+                                  y=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['예측풍속'],
+                                  mode='lines',
+                                  name='Tomorrow',
+                                  line=dict(color='#4169E1', dash='dash')))
+    fig_wind.update_layout(title='예측풍속', xaxis_title='Timestamp', yaxis_title='Wind Speed')
+    figures.append(fig_wind)
+    return figures
+
+def asos_scatter_figures(filtered_today_df, filtered_tomorrow_df, asos_df):
+    figures = []
+    # 예측 광량 산점도 (ASOS 관측 vs Today/Tomorrow 예측)
+    asos_df['tm'] = pd.to_datetime(asos_df['tm'])
+    merge_radiation_df = pd.merge(
+        filtered_today_df[['timestamp', '예측광량']],
+        filtered_tomorrow_df[['timestamp', '예측광량']],
+        how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
+    )
+    merge_radiation_df = pd.merge(merge_radiation_df, asos_df[['tm', '일사(MJ/m2)']], left_on='timestamp',
+                                  right_on='tm', how='inner')
+
+    for lead in ('Today', 'Tomorrow'):
+        figures.append(scatter_figure(merge_radiation_df['일사(MJ/m2)'],
+                                       merge_radiation_df[f'예측광량_{lead}'] * 0.0036,
+                                       f'{lead} 와 ASOS 광량 비교', 'ASOS 광량', f'{lead} 예측광량'))
+    return figures
+
+# 그래프 선택 항목 -> 그래프 생성 함수
+CHARTS = {
+    "예측 그래프": forecast_line_figures,
+    "예측 산점도 그래프": forecast_scatter_figures,
+    "ASOS 비교 그래프": asos_line_figures,
+    "ASOS 비교 산점도 그래프": asos_scatter_figures,
+}
+
+def visualize_data(start_date, end_date, stn_ids, reg_cd):
+    st.header("시각화")
+    start_date = st.date_input("그래프 시작 날짜", value= start_date)
+    end_date = st.date_input("그래프 종료 날짜", value= end_date + timedelta(days=2))
+    stn_ids = st.text_input("기상청 측후소 번호", value=stn_ids)
+    reg_cd = st.text_input("날씨마루 지점 코드", value=reg_cd)
+
+    asos_folder_path = 'output/cache/ASOS'
+    maru_folder_path = 'output/cache/maru'
+
     # 선택 옵션 추가
     options = st.multiselect(
         "출력할 그래프 선택",
-        ["예측 그래프", "예측 산점도 그래프", "ASOS 비교 그래프", 'ASOS 비교 산점도 그래프']
+        list(CHARTS)
     )
 
     # 그래프 표시 버튼
     if st.button("시각화"):
-        if "예측 그래프" in options:
-            # 예측광량 데이터 프레임 병합
-            combined_radiation_df = pd.concat([
-                filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow')
-            ])
-
-            # 예측광량 그래프
-            fig_rad = go.Figure()
-            fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Today']['timestamp'],
-                                         y=combined_radiation_df[combined_radiation_df['day'] == 'Today']['예측광량'],
-                                         mode='lines',
-                                         name='Today',
-                                         line=dict(color='#FFD700')))
-            fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['timestamp'],
-                                         y=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['예측광량'],
-                                         mode='lines',
-                                         name='Tomorrow',
-                                         line=dict(color='#FFA500', dash='dash')))
-            fig_rad.update_layout(title='예측광량', xaxis_title='Timestamp', yaxis_title='Radiation')
-            st.plotly_chart(fig_rad)
-
-            # 예측온도 데이터 프레임 병합
-            combined_temp_df = pd.concat([
-                filtered_today_df[['timestamp', '예측온도']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측온도']].assign(day='Tomorrow')
-            ])
-
-            # 예측온도 그래프
-            fig_temp = go.Figure()
-            fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Today']['timestamp'],
-                                          y=combined_temp_df[combined_temp_df['day'] == 'Today']['예측온도'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#FF6347')))
-            fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['timestamp'],
-                                          y=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['예측온도'],
-                                          mode='lines',
-                                          name='Tomorrow',
-                                          line=dict(color='#FF4500', dash='dash')))
-            fig_temp.update_layout(title='예측온도', xaxis_title='Timestamp', yaxis_title='Temperature')
-            st.plotly_chart(fig_temp)
-
-            # 예측풍속 데이터 프레임 병합
-            combined_wind_df = pd.concat([
-                filtered_today_df[['timestamp', '예측풍속']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측풍속']].assign(day='Tomorrow')
-            ])
-
-            # 예측풍속 그래프
-            fig_wind = go.Figure()
-            fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Today']['timestamp'],
-                                          y=combined_wind_df[combined_wind_df['day'] == 'Today']['예측풍속'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#1E90FF')))
-            fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['timestamp'],
-                                          y=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['예측풍속'],
-                                          mode='lines',
-                                          name='Tomorrow',
-                                          line=dict(color='#4169E1', dash='dash')))
-            fig_wind.update_layout(title='예측풍속', xaxis_title='Timestamp', yaxis_title='Wind Speed')
-            st.plotly_chart(fig_wind)
-
-        if "예측 산점도 그래프" in options:
-            # 예측 광량 산점도
-            merge_radiation_df = pd.merge(
-                filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow'),
-                how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
-            )
-
-            today_data = merge_radiation_df['예측광량_Today']
-            tomorrow_data = merge_radiation_df['예측광량_Tomorrow']
-
-            # 선형 회귀 모델 적합
-            X = sm.add_constant(tomorrow_data)  # 독립 변수에 상수 추가
-            model = sm.OLS(today_data, X).fit()
-
-            # R² 값과 RMSE 계산
-            r_squared = model.rsquared
-            rmse = np.sqrt(model.mse_resid)
-
-            # 산점도 플롯 생성
-            fig_rad_scatter = go.Figure()
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=today_data,
-                mode='markers',
-                name='Data'
-            ))
-
-            # 추세선 추가
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=model.predict(X),
-                mode='lines',
-                line=dict(color='red'),
-                name=f'Trendline (R²={r_squared:.2f}, RMSE={rmse:.2f})'
-            ))
-
-            # 레이아웃 업데이트 (1:1 비율로 설정)
-            fig_rad_scatter.update_layout(
-                title='Today 와 Tomorrow 예측광량 비교',
-                xaxis_title='Tomorrow 예측광량',
-                yaxis_title='Today 예측광량',
-                xaxis=dict(scaleanchor="y", scaleratio=1),
-                yaxis=dict(scaleanchor="x", scaleratio=1)
-            )
-
-            # Plotly 차트 표시
-            st.plotly_chart(fig_rad_scatter)
-
-            # 예측 온도 산점도
-            merge_temp_df = pd.merge(
-                filtered_today_df[['timestamp', '예측온도']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측온도']].assign(day='Tomorrow'),
-                how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
-            )
-
-            today_data = merge_temp_df['예측온도_Today']
-            tomorrow_data = merge_temp_df['예측온도_Tomorrow']
-
-            # 선형 회귀 모델 적합
-            X = sm.add_constant(tomorrow_data)  # 독립 변수에 상수 추가
-            model = sm.OLS(today_data, X).fit()
-
-            # R² 값과 RMSE 계산
-            r_squared = model.rsquared
-            rmse = np.sqrt(model.mse_resid)
-
-            # 산점도 플롯 생성
-            fig_temp_scatter = go.Figure()
-            fig_temp_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=today_data,
-                mode='markers',
-                name='Data'
-            ))
-
-            # 추세선 추가
-            fig_temp_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=model.predict(X),
-                mode='lines',
-                line=dict(color='red'),
-                name=f'Trendline (R²={r_squared:.2f}, RMSE={rmse:.2f})'
-            ))
-
-            # 레이아웃 업데이트 (1:1 비율로 설정)
-            fig_temp_scatter.update_layout(
-                title='Today 와 Tomorrow 예측온도 비교',
-                xaxis_title='Tomorrow 예측온도',
-                yaxis_title='Today 예측온도',
-                xaxis=dict(scaleanchor="y", scaleratio=1),
-                yaxis=dict(scaleanchor="x", scaleratio=1)
-            )
-
-            # Plotly 차트 표시
-            st.plotly_chart(fig_temp_scatter)
-
-            # 예측 풍속 산점도
-            merge_wind_df = pd.merge(
-                filtered_today_df[['timestamp', '예측풍속']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측풍속']].assign(day='Tomorrow'),
-                how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
-            )
-
-            today_data = merge_wind_df['예측풍속_Today']
-            tomorrow_data = merge_wind_df['예측풍속_Tomorrow']
-
-            # 선형 회귀 모델 적합
-            X = sm.add_constant(tomorrow_data)  # 독립 변수에 상수 추가
-            model = sm.OLS(today_data, X).fit()
-
-            # R² 값과 RMSE 계산
-            r_squared = model.rsquared
-            rmse = np.sqrt(model.mse_resid)
-
-            # 산점도 플롯 생성
-            fig_wind_scatter = go.Figure()
-            fig_wind_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=today_data,
-                mode='markers',
-                name='Data'
-            ))
-
-            # 추세선 추가
-            fig_wind_scatter.add_trace(go.Scatter(
-                x=tomorrow_data,
-                y=model.predict(X),
-                mode='lines',
-                line=dict(color='red'),
-                name=f'Trendline (R²={r_squared:.2f}, RMSE={rmse:.2f})'
-            ))
-
-            # 레이아웃 업데이트 (1:1 비율로 설정)
-            fig_wind_scatter.update_layout(
-                title='Today 와 Tomorrow 예측풍속 비교',
-                xaxis_title='Tomorrow 예측풍속',
-                yaxis_title='Today 예측풍속',
-                xaxis=dict(scaleanchor="y", scaleratio=1),
-                yaxis=dict(scaleanchor="x", scaleratio=1)
-            )
-
-            # Plotly 차트 표시
-            st.plotly_chart(fig_wind_scatter)
-
-        if "ASOS 비교 그래프" in options:
-            # 예측광량 데이터 프레임 병합
-            combined_radiation_df = pd.concat([
-                filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow')
-            ])
-
-            combined_radiation_df['예측광량'] = combined_radiation_df['예측광량'] * 0.0036
-
-            # 예측광량 그래프
-            fig_rad = go.Figure()
-            fig_rad.add_trace(go.Scatter(x=asos_df['tm'],
-                                        y=asos_df['일사(MJ/m2)'],
-                                        mode='lines',
-                                        name='ASOS',
-                                        line=dict(color='#FF4000')))
-
-            fig_rad.add_trace(go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Today']['timestamp'],
-                                         y=combined_radiation_df[combined_radiation_df['day'] == 'Today']['예측광량'],
-                                         mode='lines',
-                                         name='Today',
-                                         line=dict(color='#FFD700')))
-            fig_rad.add_trace(
-                go.Scatter(x=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['timestamp'],
-                           y=combined_radiation_df[combined_radiation_df['day'] == 'Tomorrow']['예측광량'],
-                           mode='lines',
-                           name='Tomorrow',
-                           line=dict(color='#FFA500', dash='dash')))
-
-            fig_rad.update_layout(title='일사(MJ/m2)', xaxis_title='Timestamp', yaxis_title='Radiation')
-            st.plotly_chart(fig_rad)
-
-
-            # 예측온도 데이터 프레임 병합
-            combined_temp_df = pd.concat([
-                filtered_today_df[['timestamp', '예측온도']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측온도']].assign(day='Tomorrow')
-            ])
-
-            # 예측온도 그래프
-            fig_temp = go.Figure()
-            fig_temp.add_trace(go.Scatter(x=asos_df['tm'],
-                                          y=asos_df['온도'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#FFBF00')))
-            fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Today']['timestamp'],
-                                          y=combined_temp_df[combined_temp_df['day'] == 'Today']['예측온도'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#FF6347')))
-            fig_temp.add_trace(go.Scatter(x=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['timestamp'],
-                                          y=combined_temp_df[combined_temp_df['day'] == 'Tomorrow']['예측온도'],
-                                          mode='lines',
-                                          name='Tomorrow',
-                                          line=dict(color='#FF4500', dash='dash')))
-            fig_temp.update_layout(title='예측온도', xaxis_title='Timestamp', yaxis_title='Temperature')
-            st.plotly_chart(fig_temp)
-
-
-            # 예측풍속 데이터 프레임 병합
-            combined_wind_df = pd.concat([
-                filtered_today_df[['timestamp', '예측풍속']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측풍속']].assign(day='Tomorrow')
-            ])
-
-            # 예측풍속 그래프
-            fig_wind = go.Figure()
-            fig_wind.add_trace(go.Scatter(x=asos_df['tm'],
-                                          y=asos_df['풍속'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#A4A4A4')))
-            fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Today']['timestamp'],
-                                          y=combined_wind_df[combined_wind_df['day'] == 'Today']['예측풍속'],
-                                          mode='lines',
-                                          name='Today',
-                                          line=dict(color='#1E90FF')))
-            fig_wind.add_trace(go.Scatter(x=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['timestamp'],
-                                          y=combined_wind_df[combined_wind_df['day'] == 'Tomorrow']['예측풍속'],
-                                          mode='lines',
-                                          name='Tomorrow',
-                                          line=dict(color='#4169E1', dash='dash')))
-            fig_wind.update_layout(title='예측풍속', xaxis_title='Timestamp', yaxis_title='Wind Speed')
-            st.plotly_chart(fig_wind)
-
-        if "ASOS 비교 산점도 그래프" in options:
-            # 예측 광량 산점도
-            filtered_today_df['timestamp'] = pd.to_datetime(filtered_today_df['timestamp'])
-            filtered_tomorrow_df['timestamp'] = pd.to_datetime(filtered_tomorrow_df['timestamp'])
-            asos_df['tm'] = pd.to_datetime(asos_df['tm'])
-
-            merge_radiation_df = pd.merge(
-                filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow'),
-                how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
-            )
-
-            merge_radiation_df = pd.merge(merge_radiation_df, asos_df[['tm', '일사(MJ/m2)']], left_on='timestamp',
-                                          right_on='tm', how='inner')
-            merge_radiation_df['예측광량_Today'] = merge_radiation_df['예측광량_Today'] * 0.0036
-            merge_radiation_df['예측광량_Tomorrow'] = merge_radiation_df['예측광량_Tomorrow'] * 0.0036
-
-
-            today_data = merge_radiation_df['예측광량_Today']
-            asos = merge_radiation_df['일사(MJ/m2)']
-
-            # 선형 회귀 모델 적합
-            X = sm.add_constant(asos)  # 독립 변수에 상수 추가
-            model = sm.OLS(today_data, X).fit()
-
-            # R² 값과 RMSE 계산
-            r_squared = model.rsquared
-            rmse = np.sqrt(model.mse_resid)
-
-            # 산점도 플롯 생성
-            fig_rad_scatter = go.Figure()
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=asos,
-                y=today_data,
-                mode='markers',
-                name='Data'
-            ))
-
-            # 추세선 추가
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=asos,
-                y=model.predict(X),
-                mode='lines',
-                line=dict(color='red'),
-                name=f'Trendline (R²={r_squared:.2f}, RMSE={rmse:.2f})'
-            ))
-
-            # 레이아웃 업데이트 (1:1 비율로 설정)
-            fig_rad_scatter.update_layout(
-                title='Today 와 ASOS 광량 비교',
-                xaxis_title='ASOS 광량',
-                yaxis_title='Today 예측광량',
-                xaxis=dict(scaleanchor="y", scaleratio=1),
-                yaxis=dict(scaleanchor="x", scaleratio=1)
-            )
-
-            # Plotly 차트 표시
-            st.plotly_chart(fig_rad_scatter)
-
-            # 예측 광량 산점도
-            filtered_today_df['timestamp'] = pd.to_datetime(filtered_today_df['timestamp'])
-            filtered_tomorrow_df['timestamp'] = pd.to_datetime(filtered_tomorrow_df['timestamp'])
-            asos_df['tm'] = pd.to_datetime(asos_df['tm'])
-
-            merge_radiation_df = pd.merge(
-                filtered_today_df[['timestamp', '예측광량']].assign(day='Today'),
-                filtered_tomorrow_df[['timestamp', '예측광량']].assign(day='Tomorrow'),
-                how='inner', on=['timestamp'], suffixes=('_Today', '_Tomorrow')
-            )
-
-            merge_radiation_df = pd.merge(merge_radiation_df, asos_df[['tm', '일사(MJ/m2)']], left_on='timestamp',
-                                          right_on='tm', how='inner')
-            merge_radiation_df['예측광량_Today'] = merge_radiation_df['예측광량_Today'] * 0.0036
-            merge_radiation_df['예측광량_Tomorrow'] = merge_radiation_df['예측광량_Tomorrow'] * 0.0036
-
-
-            Tomorrow_data = merge_radiation_df['예측광량_Tomorrow']
-            asos = merge_radiation_df['일사(MJ/m2)']
-
-            # 선형 회귀 모델 적합
-            X = sm.add_constant(asos)  # 독립 변수에 상수 추가
-            model = sm.OLS(today_data, X).fit()
-
-            # R² 값과 RMSE 계산
-            r_squared = model.rsquared
-            rmse = np.sqrt(model.mse_resid)
-
-            # 산점도 플롯 생성
-            fig_rad_scatter = go.Figure()
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=asos,
-                y=Tomorrow_data,
-                mode='markers',
-                name='Data'
-            ))
-
-            # 추세선 추가
-            fig_rad_scatter.add_trace(go.Scatter(
-                x=asos,
-                y=model.predict(X),
-                mode='lines',
-                line=dict(color='red'),
-                name=f'Trendline (R²={r_squared:.2f}, RMSE={rmse:.2f})'
-            ))
-
-            # 레이아웃 업데이트 (1:1 비율로 설정)
-            fig_rad_scatter.update_layout(
-                title='Tomorrow 와 ASOS 광량 비교',
-                xaxis_title='ASOS 광량',
-                yaxis_title='Tomorrow 예측광량',
-                xaxis=dict(scaleanchor="y", scaleratio=1),
-                yaxis=dict(scaleanchor="x", scaleratio=1)
-            )
-
-            # Plotly 차트 표시
-            st.plotly_chart(fig_rad_scatter)
+        # 캐시 파일이 바뀌지 않았으면 저장해 둔 그래프를 그대로 사용 (데이터 읽기와 그래프 생성 생략)
+        range_start = pd.to_datetime(start_date)
+        range_end = pd.to_datetime(end_date) + timedelta(days=1) - timedelta(seconds=1)
+        version = figure_cache.data_version(asos_folder_path, maru_folder_path, stn_ids, reg_cd, range_start, range_end)
+        data = None
+        for option in CHARTS:
+            if option not in options:
+                continue
+            key = figure_cache.figure_key(version, stn_ids, reg_cd, start_date, end_date, option)
+            figures = figure_cache.load_figures(key)
+            if figures is None:
+                if data is None:
+                    data = load_chart_data(start_date, end_date, stn_ids, reg_cd, asos_folder_path, maru_folder_path)
+                figures = CHARTS[option](*data)
+                figure_cache.store_figures(key, figures)
+            for fig in figures:
+                st.plotly_chart(fig)
+
+    summary_statistics(start_date, end_date, stn_ids, reg_cd)
+
+
+def summary_table(start_date, end_date, stn_ids, reg_cd, level):
+    # 수집 시 미리 계산한 집계 큐브에서 일별/월별 합계와 평균을 가져옴 (시간 자료를 다시 읽지 않음)
+    key_col = 'date' if level == 'daily' else 'month'
+    columns = []
+    for label, kind, code in (('ASOS', 'asos', stn_ids), ('Today', 'today', reg_cd), ('Tomorrow', 'tomorrow', reg_cd)):
+        df = aggregate_cube.query(kind, code, level, start_date, end_date)
+        if df.empty:
+            continue
+        df = df.set_index(key_col)
+        if kind == 'asos':
+            columns.append(df['일사(MJ/m2)_sum'].rename('ASOS 일사량(MJ/m2)'))
+            columns.append(df['온도_mean'].rename('ASOS 평균 온도'))
+        else:
+            # 예측광량은 시간 평균 W/m2이므로 합계 x 0.0036 = MJ/m2
+            columns.append((df['예측광량_sum'] * 0.0036).rename(f'{label} 예측 일사량(MJ/m2)'))
+            columns.append(df['예측온도_mean'].rename(f'{label} 평균 예측 온도'))
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1).sort_index().round(2)
+
+
+def summary_statistics(start_date, end_date, stn_ids, reg_cd):
+    st.subheader("요약 통계")
+    level = st.radio("집계 단위", ["일별", "월별"], horizontal=True)
+    if st.button("요약 통계 보기"):
+        table = summary_table(start_date, end_date, stn_ids, reg_cd, 'daily' if level == "일별" else 'monthly')
+        if table.empty:
+            st.warning("선택한 구간의 집계 자료가 없습니다.")
+            return
+        st.line_chart(table[[col for col in table.columns if '일사량' in col]])
+        st.dataframe(table)
 
 # if __name__ == "__main__":
 #     visualize_data()